@@ -0,0 +1,180 @@
+# Aggregate statistics over EV traces: distance, trips, trip-free days, energy, CO2 and petrol-equivalent cost,
+# per weekday and per week. Every file is read in a single streaming pass, fleets are summarised in parallel.
+import argparse
+import csv
+import json
+import os
+from trace_io import WEEKDAYS, as_columns, is_store, read_trace, to_float, trace_format
+
+# CO2 emissions of a petrol car in g/km, petrol car efficiency in km/l, petrol price per litre, EV consumption in Wh/km
+DEFAULT_FACTORS = {
+    'co2_g_per_km': 166.85,
+    'petrol_km_per_l': 15.3052,
+    'petrol_price_per_l': 1.36,
+    'consumption_wh_per_km': 164
+}
+# vehicles of a fleet store summarised at once, bounds the temporary arrays
+STORE_BLOCK_VEHICLES = 1024
+
+class TraceSummary:
+    def __init__(self):
+        self.files = 0
+        self.days = 0
+        self.trips = 0
+        self.trip_free_days = 0
+        self.distance = 0.0
+        self.weekday_trips = [0] * 7
+        self.weekday_distance = [0.0] * 7
+        self.week_distance = {}
+
+    def add(self, day, weekday, distance):
+        """Adds one trip, distance is None for a day without trips"""
+        if distance is None:
+            self.trip_free_days += 1
+            return
+        week = (day - 1) // 7 + 1
+        self.trips += 1
+        self.distance += distance
+        self.weekday_trips[weekday] += 1
+        self.weekday_distance[weekday] += distance
+        self.week_distance[week] = self.week_distance.get(week, 0.0) + distance
+
+    def add_columns(self, columns, days=None):
+        """Adds a whole trace given as column arrays (see trace_io), days counts the days if the columns hold
+        several vehicles"""
+        import numpy as np
+        has_trip = columns['dep_min'] >= 0
+        distance = np.nan_to_num(columns['distance'][has_trip]).astype(np.float64)
+        weekday = columns['weekday'][has_trip]
+        week = (columns['day'][has_trip] - 1) // 7 + 1
+        self.trip_free_days += int((~has_trip).sum())
+        self.trips += int(has_trip.sum())
+        self.distance += float(distance.sum())
+        for i, (trips, dist) in enumerate(zip(np.bincount(weekday, minlength=7).tolist(), np.bincount(weekday, distance, minlength=7).tolist())):
+            self.weekday_trips[i] += trips
+            self.weekday_distance[i] += dist
+        weeks, week_index = np.unique(week, return_inverse=True)
+        for w, dist in zip(weeks.tolist(), np.bincount(week_index, distance, minlength=len(weeks)).tolist()):
+            self.week_distance[w] = self.week_distance.get(w, 0.0) + dist
+        self.days += len(np.unique(columns['day'])) if days is None else days
+
+    def combine(self, other):
+        self.files += other.files
+        self.days += other.days
+        self.trips += other.trips
+        self.trip_free_days += other.trip_free_days
+        self.distance += other.distance
+        for i in range(7):
+            self.weekday_trips[i] += other.weekday_trips[i]
+            self.weekday_distance[i] += other.weekday_distance[i]
+        for week, distance in other.week_distance.items():
+            self.week_distance[week] = self.week_distance.get(week, 0.0) + distance
+        return self
+
+    def report(self, factors=None):
+        """Returns the summary with the energy, CO2 and cost figures derived from the given factors"""
+        factors = {**DEFAULT_FACTORS, **(factors or {})}
+        return {
+            'files': self.files,
+            'days': self.days,
+            'trips': self.trips,
+            'trip_free_days': self.trip_free_days,
+            'total_distance_km': self.distance,
+            'distance_per_trip_km': self.distance / self.trips if self.trips else 0.0,
+            'energy_kwh': self.distance * factors['consumption_wh_per_km'] / 1000,
+            'co2_kg': self.distance * factors['co2_g_per_km'] / 1000,
+            'petrol_cost': self.distance / factors['petrol_km_per_l'] * factors['petrol_price_per_l'],
+            'per_weekday': {WEEKDAYS[i]: {'trips': self.weekday_trips[i], 'distance_km': self.weekday_distance[i]} for i in range(7)},
+            'per_week_distance_km': {week: self.week_distance[week] for week in sorted(self.week_distance)}
+        }
+
+def summarize_store(file_name, block_vehicles=STORE_BLOCK_VEHICLES):
+    """Summarises every vehicle of a fleet store, block_vehicles vehicles of the memory map at a time"""
+    from fleet_store import FleetStore
+    store = FleetStore(file_name)
+    summary = TraceSummary()
+    # every vehicle of a store counts as one trace file
+    summary.files = len(store)
+    for first in range(0, len(store), block_vehicles):
+        last = min(first + block_vehicles, len(store))
+        summary.add_columns(as_columns(store.vehicles(first, last)), store.num_days(first, last))
+    return summary
+
+def summarize_file(file_name):
+    """Summarises one trace file (CSV, merged CSV, npz, parquet or fleet store) in a single pass"""
+    if trace_format(file_name) == 'store':
+        return summarize_store(file_name)
+    summary = TraceSummary()
+    summary.files = 1
+    if trace_format(file_name) != 'csv':
+        summary.add_columns(read_trace(file_name))
+        return summary
+    weekday_index = {name: i for i, name in enumerate(WEEKDAYS)}
+    last_day = None
+    with open(file_name, mode='r', newline='') as file:
+        reader = csv.reader(file)
+        next(reader)
+        for row in reader:
+            if len(row) < 6:
+                continue
+            day = int(row[0])
+            if day != last_day:
+                summary.days += 1
+                last_day = day
+            if row[2] == "No trips":
+                summary.add(day, weekday_index[row[1]], None)
+            else:
+                distance = to_float(row[6]) if len(row) > 6 else float('nan')
+                summary.add(day, weekday_index[row[1]], 0.0 if distance != distance else distance)
+    return summary
+
+def summarize(paths, workers=None):
+    """Summarises one or many trace files, the files are read in parallel"""
+    summary = TraceSummary()
+    if len(paths) == 1:
+        return summary.combine(summarize_file(paths[0]))
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for file_summary in executor.map(summarize_file, paths):
+            summary.combine(file_summary)
+    return summary
+
+def trace_paths(path):
+    """A single trace file or fleet store, or every trace of a fleet directory"""
+    if os.path.isdir(path) and not is_store(path):
+        from merge_trips import find_traces
+        return find_traces(path)
+    return [path]
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Summarise EV usage traces.')
+    parser.add_argument('path', type=str, help='Trace file (csv, npz or parquet), fleet store or fleet directory')
+    parser.add_argument('--workers', type=int, help='Number of worker processes for fleet directories')
+    parser.add_argument('--co2', type=float, default=DEFAULT_FACTORS['co2_g_per_km'], help='CO2 emissions of the replaced petrol car in g/km')
+    parser.add_argument('--petrol_km_per_l', type=float, default=DEFAULT_FACTORS['petrol_km_per_l'], help='Efficiency of the replaced petrol car in km/l')
+    parser.add_argument('--petrol_price', type=float, default=DEFAULT_FACTORS['petrol_price_per_l'], help='Petrol price per litre')
+    parser.add_argument('--consumption', type=float, default=DEFAULT_FACTORS['consumption_wh_per_km'], help='EV consumption in Wh/km')
+    parser.add_argument('--json', action='store_true', help='Print the full summary as JSON')
+    return parser
+
+
+if __name__ == '__main__':
+    parser = build_parser()
+    args = parser.parse_args()
+    factors = {
+        'co2_g_per_km': args.co2,
+        'petrol_km_per_l': args.petrol_km_per_l,
+        'petrol_price_per_l': args.petrol_price,
+        'consumption_wh_per_km': args.consumption
+    }
+    report = summarize(trace_paths(args.path), args.workers).report(factors)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"Total Distance (km): {report['total_distance_km']}")
+        print(f"Energy (kWh): {report['energy_kwh']}")
+        print(f"Petrol Cost: {report['petrol_cost']}")
+        print(f"Total CO2 Emissions (kg): {report['co2_kg']}")
+        print(f"Days without trips: {report['trip_free_days']}")
+        print(f"Number of Trips: {report['trips']}")
+        print(f"Distance per trip: {report['distance_per_trip_km']}")
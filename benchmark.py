@@ -0,0 +1,194 @@
+# Throughput benchmarks of the generation, writing, merging and analysis steps over horizons of 1 to 100 years
+# and fleets of 1 to 10k vehicles. Every case runs in a fresh process, so its peak RSS is its own, and the
+# results (days/s, trips/s, peak RSS) are written to a JSON file that can be compared with an earlier run.
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+import ev_simulation
+import ev_simulation_extended
+from analytics import summarize_file
+from fleet import run_fleet, vehicle_args
+from merge_trips import process_file
+
+CASES = ['generate', 'write_csv', 'merge', 'merge_vectorized', 'analytics', 'fleet', 'startup']
+DEFAULT_YEARS = [1, 10, 100]
+DEFAULT_FLEET_SIZES = [1, 100, 1000, 10000]
+# fleet vehicles are simulated for one year each
+FLEET_DAYS = 365
+# entry points whose import time is measured by the startup case
+STARTUP_MODULES = ['ev_simulation', 'ev_simulation_extended', 'merge_trips', 'analytics', 'fleet', 'server']
+
+def simulate(variant, days):
+    """Trip data of one seeded vehicle, generated without the result cache"""
+    module = ev_simulation if variant == 'simple' else ev_simulation_extended
+    args = vehicle_args(variant, {'days': days, 'seed': 1, 'no_cache': True})
+    ev = module.ElectricVehicle(args.ev_battery, args.max_soc, args.min_soc, args.consumption)
+    if variant == 'simple':
+        return module.generate_trip_data(args, ev)
+    return module.generate_trip_data(args, ev, module.build_day_trips(args))
+
+def count_trips(trip_data):
+    return sum(1 for _, trips in trip_data for trip in trips if trip[1] != "No trips")
+
+def peak_rss_mb():
+    """Peak resident set size of this process and its finished children"""
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+def run_case(case, variant='simple', years=1, vehicles=1, workers=None):
+    """Runs one benchmark case and returns its timing, only the measured step is timed"""
+    days = years * 365
+    with tempfile.TemporaryDirectory() as tmpdir:
+        trace = os.path.join(tmpdir, 'ev_data.csv')
+        if case == 'fleet':
+            days = vehicles * FLEET_DAYS
+            start = time.perf_counter()
+            trips = sum(count_trips(trip_data) for _, trip_data in run_fleet([{'days': FLEET_DAYS}] * vehicles, variant, seed=1, workers=workers))
+        elif case == 'generate':
+            start = time.perf_counter()
+            trips = count_trips(simulate(variant, days))
+        else:
+            trip_data = simulate(variant, days)
+            trips = count_trips(trip_data)
+            if case == 'write_csv':
+                start = time.perf_counter()
+                ev_simulation.write_to_csv(trace, trip_data)
+            else:
+                ev_simulation.write_to_csv(trace, trip_data)
+                start = time.perf_counter()
+                if case == 'analytics':
+                    summarize_file(trace)
+                else:
+                    process_file(trace, os.path.join(tmpdir, 'merged.csv'), vectorized=case == 'merge_vectorized')
+        seconds = time.perf_counter() - start
+    return {
+        'case': case,
+        'variant': variant,
+        'days': days,
+        'vehicles': vehicles,
+        'trips': trips,
+        'seconds': seconds,
+        'days_per_s': days / seconds,
+        'trips_per_s': trips / seconds,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+def run_isolated(case, variant='simple', years=1, vehicles=1, workers=None):
+    """run_case in a fresh process, so the peak RSS of earlier cases does not carry over"""
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+        return executor.submit(run_case, case, variant, years, vehicles, workers).result()
+
+def wall_time(command, repeats):
+    """Shortest wall time of running command in a fresh process"""
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=cwd, capture_output=True, check=True)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def startup_times(repeats=5):
+    """Seconds to start the interpreter, to import every entry point, to run a one-day simulation from the command
+    line, and to answer a one-day simulation request of an already running server.py"""
+    times = {'python': wall_time([sys.executable, '-c', 'pass'], repeats)}
+    for module in STARTUP_MODULES:
+        times[f"import_{module}"] = wall_time([sys.executable, '-c', f"import {module}"], repeats)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        output = os.path.join(tmpdir, 'ev_data.csv')
+        times['cli_run'] = wall_time([sys.executable, 'ev_simulation.py', '--days', '1', '--output', output], repeats)
+        server = subprocess.Popen([sys.executable, 'server.py'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                  stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        request = json.dumps({'variant': 'simple', 'args': {'days': 1, 'output': output}}) + '\n'
+        request_times = []
+        # the first request also waits for the server to start
+        for _ in range(repeats + 1):
+            start = time.perf_counter()
+            server.stdin.write(request)
+            server.stdin.flush()
+            server.stdout.readline()
+            request_times.append(time.perf_counter() - start)
+        server.stdin.close()
+        server.wait()
+    times['server_request'] = min(request_times[1:])
+    return times
+
+def benchmark_plan(cases=CASES, years=DEFAULT_YEARS, fleet_sizes=DEFAULT_FLEET_SIZES, variants=('simple', 'extended')):
+    """The (case, variant, years, vehicles) combinations to run, generation covers both simulators"""
+    plan = []
+    for case in cases:
+        if case == 'startup':
+            continue
+        if case == 'fleet':
+            plan.extend((case, 'simple', 1, vehicles) for vehicles in fleet_sizes)
+        elif case == 'generate':
+            plan.extend((case, variant, n_years, 1) for variant in variants for n_years in years)
+        else:
+            plan.extend((case, 'simple', n_years, 1) for n_years in years)
+    return plan
+
+def environment():
+    """Commit and versions the results were measured with"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count()
+    }
+
+def case_name(result):
+    return f"{result['case']}/{result['variant']}/{result['days']}d/{result['vehicles']}v"
+
+def compare(results, baseline):
+    """Relative change in days/s of every case that is also in the baseline, positive is faster"""
+    previous = {case_name(result): result for result in baseline['results']}
+    return {case_name(result): result['days_per_s'] / previous[case_name(result)]['days_per_s'] - 1
+            for result in results if case_name(result) in previous}
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Benchmark generation, writing, merging and analysis throughput.')
+    parser.add_argument('--output', type=str, help='JSON file receiving the results, without it the results are only printed')
+    parser.add_argument('--cases', type=str, nargs='+', default=CASES, choices=CASES, help='Cases to run')
+    parser.add_argument('--years', type=int, nargs='+', default=DEFAULT_YEARS, help='Horizons in years')
+    parser.add_argument('--fleet_sizes', type=int, nargs='+', default=DEFAULT_FLEET_SIZES, help='Numbers of vehicles of the fleet case')
+    parser.add_argument('--workers', type=int, help='Number of worker processes of the fleet case')
+    parser.add_argument('--compare', type=str, help='Earlier results file to compare with')
+    return parser
+
+
+if __name__ == '__main__':
+    parser = build_parser()
+    args = parser.parse_args()
+    results = []
+    for case, variant, years, vehicles in benchmark_plan(args.cases, args.years, args.fleet_sizes):
+        result = run_isolated(case, variant, years, vehicles, args.workers)
+        results.append(result)
+        print(f"{case_name(result)}: {result['seconds']:.3f} s, {result['days_per_s']:.0f} days/s, {result['trips_per_s']:.0f} trips/s, {result['peak_rss_mb']:.0f} MB")
+    startup = {}
+    if 'startup' in args.cases:
+        startup = startup_times()
+        for name, seconds in startup.items():
+            print(f"startup/{name}: {seconds * 1000:.1f} ms")
+    if args.output:
+        with open(args.output, mode='w') as file:
+            json.dump({**environment(), 'results': results, 'startup': startup}, file, indent=1)
+    if args.compare:
+        with open(args.compare, mode='r') as file:
+            for name, change in compare(results, json.load(file)).items():
+                print(f"{name}: {change:+.1%} days/s")
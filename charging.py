@@ -0,0 +1,108 @@
+# Charging-load profiles from EV traces. Every vehicle charges at home at a fixed charger power as soon as it
+# returns from its last trip of the day, until the energy used that day is back in the battery, and counts as
+# plugged in whenever it is not on a trip. Both are built on a minute-resolution difference array over the whole
+# horizon and averaged into 15-minute or hourly slots, fleets are the sum of their vehicles' profiles.
+import argparse
+import csv
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from analytics import trace_paths
+from trace_io import read_trace
+
+MINUTES_PER_DAY = 24 * 60
+DEFAULT_CHARGER_KW = 7.4
+RESOLUTIONS = [15, 60]
+
+def charging_profile(columns, charger_kw=DEFAULT_CHARGER_KW, resolution=15, num_days=None):
+    """Mean charging power in kW and plugged-in share of every slot of one trace given as column arrays (see trace_io),
+    charging that runs past the last day is cut off"""
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"Resolution must be one of {RESOLUTIONS} minutes")
+    if charger_kw <= 0:
+        raise ValueError("Charger power must be a positive number")
+    num_days = int(columns['day'].max()) if num_days is None else num_days
+    num_minutes = num_days * MINUTES_PER_DAY
+    has_trip = columns['dep_min'] >= 0
+    day = columns['day'][has_trip].astype(np.int64)
+    order = np.argsort(day, kind='stable')
+    day = day[order]
+    dep = columns['dep_min'][has_trip][order].astype(np.int64)
+    arr = columns['arr_min'][has_trip][order].astype(np.int64)
+    # trips arriving after midnight end on the next day
+    arr = np.where(arr < dep, arr + MINUTES_PER_DAY, arr)
+    dep += (day - 1) * MINUTES_PER_DAY
+    arr += (day - 1) * MINUTES_PER_DAY
+
+    # away from home between departure and arrival, +1/-1 steps summed up minute by minute
+    away = np.zeros(num_minutes + 1)
+    np.add.at(away, np.minimum(dep, num_minutes), 1)
+    np.add.at(away, np.minimum(arr, num_minutes), -1)
+    plugged_in = np.cumsum(away[:-1]) <= 0
+
+    # the energy used over a day is recharged from the last arrival of that day at full charger power
+    power = np.zeros(num_minutes + 2)
+    if len(day):
+        starts = np.flatnonzero(np.r_[True, day[1:] != day[:-1]])
+        energy = np.maximum.reduceat(columns['soc_dep'][has_trip][order], starts) - np.minimum.reduceat(columns['soc_arr'][has_trip][order], starts)
+        start = np.maximum.reduceat(arr, starts)
+        duration = np.maximum(np.nan_to_num(energy.astype(np.float64)), 0) / charger_kw * 60
+        full_minutes = np.floor(duration).astype(np.int64)
+        end = start + full_minutes
+        # the last, partial minute draws the remaining energy at a share of the charger power
+        partial = (duration - full_minutes) * charger_kw
+        np.add.at(power, np.minimum(start, num_minutes + 1), charger_kw)
+        np.add.at(power, np.minimum(end, num_minutes + 1), partial - charger_kw)
+        np.add.at(power, np.minimum(end + 1, num_minutes + 1), -partial)
+    power = np.cumsum(power)[:num_minutes]
+
+    return {
+        'charging_kw': power.reshape(-1, resolution).mean(axis=1),
+        'plugged_in': plugged_in.reshape(-1, resolution).mean(axis=1)
+    }
+
+def profile_file(task):
+    file_name, charger_kw, resolution = task
+    return charging_profile(read_trace(file_name), charger_kw, resolution)
+
+def fleet_profile(paths, charger_kw=DEFAULT_CHARGER_KW, resolution=15, workers=None):
+    """Sums the profiles of one or many trace files, plugged_in becomes the mean number of vehicles plugged in"""
+    tasks = [(path, charger_kw, resolution) for path in paths]
+    if len(tasks) == 1:
+        profiles = [profile_file(tasks[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            profiles = list(executor.map(profile_file, tasks))
+    # vehicles with a shorter horizon contribute nothing to the later slots
+    num_slots = max(len(profile['charging_kw']) for profile in profiles)
+    fleet = {'charging_kw': np.zeros(num_slots), 'plugged_in': np.zeros(num_slots)}
+    for profile in profiles:
+        for name in fleet:
+            fleet[name][:len(profile[name])] += profile[name]
+    return fleet
+
+def write_profile(file_name, profile, resolution=15):
+    slots_per_day = MINUTES_PER_DAY // resolution
+    with open(file_name, mode='w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['Day', 'Time', 'Charging Power (kW)', 'Plugged In'])
+        for slot, (power, plugged_in) in enumerate(zip(profile['charging_kw'].tolist(), profile['plugged_in'].tolist())):
+            minute = slot % slots_per_day * resolution
+            writer.writerow([slot // slots_per_day + 1, f"{minute // 60:02d}:{minute % 60:02d}", f"{power:.3f}", f"{plugged_in:.3f}"])
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Build charging-power and plug-in availability profiles from EV traces.')
+    parser.add_argument('path', type=str, help='Trace file (csv, npz or parquet) or fleet directory')
+    parser.add_argument('--output', type=str, default='charging_profile.csv', help='Output CSV with one row per time slot')
+    parser.add_argument('--charger_kw', type=float, default=DEFAULT_CHARGER_KW, help='Power of the home charger in kW')
+    parser.add_argument('--resolution', type=int, default=15, choices=RESOLUTIONS, help='Length of a time slot in minutes')
+    parser.add_argument('--workers', type=int, help='Number of worker processes for fleet directories')
+    return parser
+
+
+if __name__ == '__main__':
+    parser = build_parser()
+    args = parser.parse_args()
+    try:
+        write_profile(args.output, fleet_profile(trace_paths(args.path), args.charger_kw, args.resolution, args.workers), args.resolution)
+    except ValueError as e:
+        print(f"Input Error: {e}")
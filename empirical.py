@@ -0,0 +1,145 @@
+# Empirical non-commuting trips. Instead of the uniform departure times, 1-2 h durations and 50 km/h driving
+# share of RandomNonCommuteTrips, a model fitted from reference traces (e.g. the shipped ev_data_T*.csv and
+# merged files) gives per weekday the distribution of the number of non-commuting trips per day and of their
+# departure hour, and per weekday and departure hour quantile tables of duration, distance and travel time.
+# Trips are drawn with vectorized lookups in tabulated inverse CDFs. Traces do not label commutes, trips away
+# from home for at least --commute_hours are taken to be commutes and left out of the fit.
+import argparse
+import numpy as np
+from trace_io import read_trace
+
+# levels of the duration/distance/travel time quantile tables
+QUANTILES = np.linspace(0, 1, 33)
+# (weekday, hour) cells with fewer trips use the quantiles of their whole weekday, or of all trips
+MIN_CELL_TRIPS = 10
+DEFAULT_COMMUTE_HOURS = 4.0
+# resolution of the tabulated inverse CDFs, probabilities are rounded to multiples of 1 / INVERSE_CDF_SIZE
+INVERSE_CDF_SIZE = 8192
+MODEL_ARRAYS = ['count_cdf', 'hour_cdf', 'duration', 'distance', 'travel_time', 'days_fitted']
+
+def to_cdf(counts):
+    """Normalized cumulative sums of the rows of counts, the last entry of every row is exactly 1"""
+    cdf = np.cumsum(counts, axis=1, dtype=float)
+    cdf /= cdf[:, -1:]
+    cdf[:, -1] = 1.0
+    return cdf
+
+def inverse_cdf_table(cdf, size=INVERSE_CDF_SIZE):
+    """Every row of a CDF table inverted at the midpoints of size equal probability steps, flattened row after row"""
+    levels = (np.arange(size) + 0.5) / size
+    return np.concatenate([np.searchsorted(row, levels, side='right') for row in cdf])
+
+def inverse_cdf(table, rows, rng, size=INVERSE_CDF_SIZE):
+    """Draws one index per sample from row rows of a table built by inverse_cdf_table, a single gather
+    instead of a binary search per sample"""
+    return table[rows * size + rng.integers(0, size, len(rows))]
+
+def quantile_lookup(flat_table, levels, rows, u):
+    """Linear interpolation of the quantile tables rows (flattened, levels values each) at the levels u"""
+    position = u * (levels - 1)
+    lower = np.minimum(position.astype(np.int64), levels - 2)
+    index = rows * levels + lower
+    return flat_table[index] + (position - lower) * (flat_table[index + 1] - flat_table[index])
+
+def cell_quantiles(values, weekday, hour):
+    """(7, 24, len(QUANTILES)) quantile table of values, falling back to the weekday or all trips in sparse cells"""
+    pooled = np.quantile(values, QUANTILES)
+    table = np.empty((7, 24, len(QUANTILES)))
+    for day in range(7):
+        on_day = weekday == day
+        day_quantiles = np.quantile(values[on_day], QUANTILES) if on_day.sum() >= MIN_CELL_TRIPS else pooled
+        for h in range(24):
+            in_cell = on_day & (hour == h)
+            table[day, h] = np.quantile(values[in_cell], QUANTILES) if in_cell.sum() >= MIN_CELL_TRIPS else day_quantiles
+    return table
+
+class EmpiricalModel:
+    def __init__(self, count_cdf, hour_cdf, duration, distance, travel_time, days_fitted):
+        self.count_cdf = count_cdf
+        self.hour_cdf = hour_cdf
+        self.duration = duration
+        self.distance = distance
+        self.travel_time = travel_time
+        self.days_fitted = days_fitted
+        self.count_table = inverse_cdf_table(count_cdf)
+        self.hour_table = inverse_cdf_table(hour_cdf)
+        self.flat_tables = [table.ravel() for table in (duration, distance, travel_time)]
+
+    def sample(self, rng, days, weekday):
+        """Non-commuting trips of the given days as (trip_days, t_dep, t_arr, distance, travel_time), times in
+        hours. Duration, distance and travel time share one quantile level, so longer trips drive further."""
+        num_trips = inverse_cdf(self.count_table, weekday.astype(np.int64), rng)
+        trip_days = np.repeat(days, num_trips)
+        trip_weekday = np.repeat(weekday, num_trips).astype(np.int64)
+        hour = inverse_cdf(self.hour_table, trip_weekday, rng)
+        t_dep = hour + rng.random(len(trip_days))
+        level = rng.random(len(trip_days))
+        rows = trip_weekday * 24 + hour
+        duration, distance, travel_time = (quantile_lookup(table, len(QUANTILES), rows, level) for table in self.flat_tables)
+        t_arr = t_dep + duration
+        t_arr[t_arr >= 24] -= 24
+        return trip_days, t_dep, t_arr, distance, travel_time
+
+    def save(self, file_name):
+        np.savez(file_name, **{name: getattr(self, name) for name in MODEL_ARRAYS})
+
+def fit_columns(traces, commute_hours=DEFAULT_COMMUTE_HOURS):
+    """Fits an EmpiricalModel to the column arrays (see trace_io.read_trace) of reference traces"""
+    day_counts, day_weekdays, trips = [], [], []
+    for columns in traces:
+        duration = (columns['arr_min'].astype(np.int64) - columns['dep_min']) % 1440
+        is_trip = columns['dep_min'] >= 0
+        non_commute = is_trip & (duration < commute_hours * 60) & np.isfinite(columns['distance']) & np.isfinite(columns['travel_time'])
+        days, first = np.unique(columns['day'], return_index=True)
+        day_counts.append(np.bincount(np.searchsorted(days, columns['day'][non_commute]), minlength=len(days)))
+        day_weekdays.append(columns['weekday'][first])
+        trips.append((columns['weekday'][non_commute], columns['dep_min'][non_commute] // 60, duration[non_commute] / 60,
+                      columns['distance'][non_commute], columns['travel_time'][non_commute]))
+    day_counts, day_weekdays = np.concatenate(day_counts), np.concatenate(day_weekdays)
+    weekday, hour, duration, distance, travel_time = (np.concatenate(values).astype(float) for values in zip(*trips))
+    if not len(weekday):
+        raise ValueError("The reference traces contain no non-commuting trips")
+    weekday, hour = weekday.astype(np.int64), hour.astype(np.int64)
+
+    days_fitted = np.bincount(day_weekdays, minlength=7)
+    counts = np.zeros((7, day_counts.max() + 1))
+    np.add.at(counts, (day_weekdays, day_counts), 1)
+    # weekdays missing from the references behave like the average weekday
+    counts[days_fitted == 0] = counts.sum(axis=0)
+    hours = np.zeros((7, 24))
+    np.add.at(hours, (weekday, hour), 1)
+    hours[hours.sum(axis=1) == 0] = hours.sum(axis=0)
+    return EmpiricalModel(to_cdf(counts), to_cdf(hours), cell_quantiles(duration, weekday, hour),
+                          cell_quantiles(distance, weekday, hour), cell_quantiles(travel_time, weekday, hour), days_fitted)
+
+def fit_traces(file_names, commute_hours=DEFAULT_COMMUTE_HOURS):
+    """Fits an EmpiricalModel to trace files in any format read_trace supports"""
+    return fit_columns([read_trace(file_name) for file_name in file_names], commute_hours)
+
+def load_model(file_name):
+    try:
+        with np.load(file_name) as data:
+            missing = [name for name in MODEL_ARRAYS if name not in data]
+            if missing:
+                raise ValueError(f"{file_name} is not an empirical trip model, it lacks {', '.join(missing)}")
+            return EmpiricalModel(*(data[name] for name in MODEL_ARRAYS))
+    except FileNotFoundError:
+        raise ValueError(f"Empirical trip model {file_name} does not exist, fit one with empirical.py")
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Fit empirical non-commuting trip distributions to reference traces.')
+    parser.add_argument('traces', type=str, nargs='+', help='Reference trace files (CSV, merged CSV, npz or parquet)')
+    parser.add_argument('--output', type=str, default='empirical_model.npz', help='File receiving the fitted model (.npz)')
+    parser.add_argument('--commute_hours', type=float, default=DEFAULT_COMMUTE_HOURS, help='Trips away from home for at least this many hours are commutes and not fitted')
+    return parser
+
+
+if __name__ == '__main__':
+    parser = build_parser()
+    args = parser.parse_args()
+    try:
+        model = fit_traces(args.traces, args.commute_hours)
+        model.save(args.output)
+        print(f"Fitted {int(model.days_fitted.sum())} reference days into {args.output}")
+    except ValueError as e:
+        print(f"Input Error: {e}")
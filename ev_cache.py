@@ -0,0 +1,77 @@
+# On-disk cache of simulation results. A seeded run is fully determined by its arguments, so the trace is
+# stored under a hash of the canonical arguments and loaded instead of being regenerated. Traces are kept as
+# the simulators' trip_dtype() record arrays in .npy files, the least recently used files are evicted once the
+# cache exceeds its size limit. The key also covers the sources of the modules generating the traces, so
+# entries of an older generator are never served.
+import functools
+import hashlib
+import json
+import os
+import numpy as np
+
+# modules whose code determines the generated trips
+SOURCE_MODULES = ['ev_engine', 'ev_calendar', 'ev_soc', 'ev_random', 'empirical', 'merge_trips', 'trace_io',
+                  'ev_simulation', 'ev_simulation_extended']
+DEFAULT_CACHE_DIR = os.environ.get('SPAGHETTI_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'spaghetti'))
+DEFAULT_CACHE_SIZE_MB = 512
+# arguments that only affect how or where the trace is written, not the trace itself
+IGNORED_ARGS = {'output', 'format', 'no_cache', 'cache_dir', 'cache_size', 'floor_output', 'profile', 'cprofile', 'extend'}
+# arguments naming input files, the key covers their contents rather than their names
+FILE_ARGS = {'empirical'}
+
+def is_cacheable(args):
+    return getattr(args, 'seed', None) is not None and not getattr(args, 'no_cache', False)
+
+@functools.lru_cache(maxsize=None)
+def source_version(directory=os.path.dirname(os.path.abspath(__file__))):
+    """Hash of the sources of SOURCE_MODULES in directory"""
+    digest = hashlib.sha256()
+    for module in SOURCE_MODULES:
+        with open(os.path.join(directory, f"{module}.py"), mode='rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+def cache_key(variant, args):
+    """Hash of the simulator variant and the canonical JSON of its arguments, including the seed"""
+    params = {key: value for key, value in vars(args).items() if key not in IGNORED_ARGS}
+    for key in FILE_ARGS:
+        if params.get(key) and os.path.exists(params[key]):
+            with open(params[key], mode='rb') as file:
+                params[key] = hashlib.sha256(file.read()).hexdigest()
+    canonical = json.dumps({'version': source_version(), 'variant': variant, 'args': params}, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+def evict(cache_dir, max_bytes):
+    """Removes the least recently used entries until the cache fits in max_bytes"""
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith('.npy'):
+            path = os.path.join(cache_dir, name)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        os.remove(path)
+        total -= size
+
+def cached_run(variant, args, run):
+    """Returns the record array of run(args), loaded from the cache if the same arguments and seed were simulated before"""
+    if not is_cacheable(args):
+        return run(args)
+    cache_dir = getattr(args, 'cache_dir', None) or DEFAULT_CACHE_DIR
+    path = os.path.join(cache_dir, cache_key(variant, args) + '.npy')
+    if os.path.exists(path):
+        # the modification time marks the entry as recently used
+        os.utime(path)
+        return np.load(path)
+
+    trips = run(args)
+    os.makedirs(cache_dir, exist_ok=True)
+    # write to a temporary name first so concurrent runs never read a partial entry
+    tmp_path = f"{path[:-4]}.{os.getpid()}.tmp.npy"
+    np.save(tmp_path, trips)
+    os.replace(tmp_path, path)
+    evict(cache_dir, (getattr(args, 'cache_size', None) or DEFAULT_CACHE_SIZE_MB) * 1e6)
+    return trips
@@ -0,0 +1,64 @@
+# Calendar of the simulated horizon. The weekday of every day and whether it is a commute day are precomputed
+# once as arrays from the WFH flags, weekends, holiday weeks and public holidays, so the day loops only look
+# them up. Without a start date, day 1 is a Monday and every year has 52 weeks; with a start date, real
+# weekdays and ISO weeks are used.
+import numpy as np
+
+def parse_dates(value):
+    """Parses a comma-separated list of YYYY-MM-DD dates"""
+    if not value:
+        return []
+    try:
+        return [np.datetime64(date.strip(), 'D') for date in value.split(',') if date.strip()]
+    except ValueError:
+        raise ValueError(f"Dates must be given as YYYY-MM-DD: {value}")
+
+def day_calendar(num_days, start_date=None):
+    """Weekday (0 is Monday), year index and week of year (1-53) of every day of the horizon"""
+    days = np.arange(num_days)
+    if start_date is None:
+        week_index = days // 7
+        return days % 7, week_index // 52, week_index % 52 + 1
+    dates = np.datetime64(start_date, 'D') + days
+    # 1970-01-01 was a Thursday
+    weekday = (dates.astype(np.int64) + 3) % 7
+    # the ISO week belongs to the year that contains its Thursday
+    thursday = dates + (3 - weekday)
+    iso_year = thursday.astype('datetime64[Y]')
+    week = (thursday - iso_year.astype('datetime64[D]')).astype(np.int64) // 7 + 1
+    year = iso_year.astype(np.int64) - iso_year.astype(np.int64)[0]
+    return weekday, year, week
+
+def plan_holidays(num_years, holiday_weeks, rng):
+    """Samples the holiday weeks (1-52) of every year of the horizon, one row per year"""
+    if holiday_weeks == 0:
+        return np.zeros((num_years, 0), dtype=np.int64)
+    return np.stack([rng.choice(np.arange(1, 53), holiday_weeks, replace=False) for _ in range(num_years)])
+
+def commute_day_mask(args, weekday, year, week, holiday_plan, public_holiday_days=()):
+    """True on the days with a commute: not a weekend, WFH day, holiday week or public holiday"""
+    no_commute = np.array([args.wfh_monday, args.wfh_tuesday, args.wfh_wednesday, args.wfh_thursday, args.wfh_friday, 1, 1]) == 1
+    is_holiday_week = np.zeros((holiday_plan.shape[0], 54), dtype=bool)
+    is_holiday_week[np.arange(holiday_plan.shape[0])[:, None], holiday_plan] = True
+    mask = ~no_commute[weekday] & ~is_holiday_week[year, week]
+    mask[np.asarray(public_holiday_days, dtype=np.int64)] = False
+    return mask
+
+def build_calendar(args, rng, holiday_plan=None):
+    """Returns the weekday of every day, the commute-day mask and the holiday plan of the whole horizon. An
+    existing holiday plan (of an earlier, shorter horizon) is kept, only the years it lacks are drawn."""
+    start_date = getattr(args, 'start_date', None)
+    public_holidays = parse_dates(getattr(args, 'public_holidays', None))
+    if public_holidays and start_date is None:
+        raise ValueError("Public holidays require a start date")
+    weekday, year, week = day_calendar(args.days, start_date)
+    num_years = int(year[-1]) + 1
+    if holiday_plan is None:
+        holiday_plan = plan_holidays(num_years, getattr(args, 'N_hw', 0), rng)
+    elif len(holiday_plan) < num_years:
+        holiday_plan = np.concatenate([holiday_plan, plan_holidays(num_years - len(holiday_plan), holiday_plan.shape[1], rng)])
+    public_holiday_days = []
+    if public_holidays:
+        offsets = (np.array(public_holidays) - np.datetime64(start_date, 'D')).astype(np.int64)
+        public_holiday_days = offsets[(offsets >= 0) & (offsets < args.days)]
+    return weekday, commute_day_mask(args, weekday, year, week, holiday_plan, public_holiday_days), holiday_plan
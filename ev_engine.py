@@ -0,0 +1,439 @@
+# Shared generation core of ev_simulation.py and ev_simulation_extended.py. Trips are produced by a list of
+# trip-source stages (commutes, random or empirical non-commuting trips, fixed per-weekday non-commuting trips), each of
+# which samples all of its trips for a chunk of days as arrays. The engine then orders the trips by day and
+# computes the SOC with a cumulative sum per day, so both CLIs share one hot path and one output schema.
+# Trips stay in a compact trip_dtype() record array (see trace_io) all the way to the writers, the
+# formatted (day, trips) tuples are only built for callers that ask for them.
+import argparse
+import csv
+import functools
+import os
+import numpy as np
+from ev_cache import DEFAULT_CACHE_SIZE_MB, cached_run, is_cacheable
+from ev_calendar import build_calendar
+from empirical import load_model
+from ev_random import make_rng
+from ev_soc import SocCarryOver
+from ev_state import TraceState, read_state, state_path, trace_params, write_state
+from profiling import PROFILER, profiled
+from merge_trips import merge_columns
+from trace_io import COLUMNS, FORMATS, HEADER, WEEKDAYS, as_columns, as_records, trace_size, trip_dtype, truncate_trace, write_trips
+
+# number of days drawn at once, bounds the memory use of long horizons
+CHUNK_DAYS = 3650
+# number of rows buffered before they are written out
+BUFFER_ROWS = 4096
+# non-commuting trips: driving takes 20% of the time away from home, at 50 km/h
+DRIVING_SHARE = 0.2
+AVERAGE_SPEED_KMH = 50
+
+class ElectricVehicle:
+    def __init__(self, battery_size, max_soc, min_soc, consumption):
+        self.battery_size = battery_size
+        self.max_soc = max_soc
+        self.min_soc = min_soc
+        self.consumption = consumption
+
+    def compute_SOC_arr(self, dist_km):
+        used_kwh = (dist_km * self.consumption) / 1000
+        soc_change = used_kwh / self.battery_size
+        return max(self.max_soc * self.battery_size - soc_change, self.min_soc * self.battery_size)
+
+class DayTrips:
+    def __init__(self, num_trips: int, t_dep: float, t_arr: float, dist: float):
+        self.num_trips = num_trips
+        self.t_dep = t_dep
+        self.t_arr = t_arr
+        self.dist = dist
+
+# arguments every vehicle needs, and the optional ones with the value assumed when they are missing
+REQUIRED_INPUTS = ['days', 'ev_battery', 'max_soc', 'min_soc', 'consumption', 'wfh_monday', 'wfh_tuesday', 'wfh_wednesday',
+                   'wfh_thursday', 'wfh_friday', 'C_dist', 'C_dept', 'C_arr', 'N_nc']
+OPTIONAL_INPUTS = {'N_hw': 0, 'start_date': None, 'public_holidays': None, 'home_charger_kw': 0.0, 'work_charger_kw': 0.0}
+
+def is_wfh_invalid(v):
+    return ~np.isin(np.stack([v['wfh_monday'], v['wfh_tuesday'], v['wfh_wednesday'], v['wfh_thursday'], v['wfh_friday']]), [0, 1]).all(axis=0)
+
+# (message, test returning which vehicles are invalid) in the order they are checked
+INPUT_CHECKS = [
+    ("SOC values must be between 0 and 1", lambda v: ~((0 <= v['max_soc']) & (v['max_soc'] <= 1) & (0 <= v['min_soc']) & (v['min_soc'] <= 1))),
+    ("Max SOC must be greater than Min SOC", lambda v: v['max_soc'] < v['min_soc']),
+    ("EV battery size must be a positive number", lambda v: v['ev_battery'] <= 0),
+    ("EV consumption must be a positive number", lambda v: v['consumption'] <= 0),
+    ("Departure and arrival times must be within 24-hour range", lambda v: ~((0 <= v['C_dept']) & (v['C_dept'] < 24) & (0 <= v['C_arr']) & (v['C_arr'] < 24))),
+    ("Departure time must be before arrival time", lambda v: v['C_dept'] >= v['C_arr']),
+    ("WFH day inputs must be either 0 or 1", is_wfh_invalid),
+    ("Number of days must be a positive number", lambda v: v['days'] <= 0),
+    ("Commute distance must be non-negative", lambda v: v['C_dist'] < 0),
+    ("Number of weekly non-commuting trips must be non-negative", lambda v: v['N_nc'] < 0),
+    ("Number of holiday weeks must be between 0 and 52", lambda v: ~((0 <= v['N_hw']) & (v['N_hw'] <= 52))),
+    ("Public holidays require a start date", lambda v: np.array([bool(holidays) and start is None for holidays, start in zip(v['public_holidays'], v['start_date'])], dtype=bool)),
+    ("Charger powers must be non-negative", lambda v: (v['home_charger_kw'] < 0) | (v['work_charger_kw'] < 0)),
+]
+
+def input_table(vehicles):
+    """Arrays of the validated arguments with one entry per vehicle, vehicles are dicts or Namespaces"""
+    vehicles = [vars(vehicle) if isinstance(vehicle, argparse.Namespace) else vehicle for vehicle in vehicles]
+    table = {name: np.array([vehicle[name] for vehicle in vehicles]) for name in REQUIRED_INPUTS}
+    for name, default in OPTIONAL_INPUTS.items():
+        values = [vehicle.get(name, default) for vehicle in vehicles]
+        values = [default if value is None else value for value in values] if default is not None else values
+        table[name] = np.array(values, dtype=object if default is None else None)
+    return table
+
+def validate_inputs(table):
+    """Validates many vehicles at once, table maps the argument names to arrays with one entry per vehicle"""
+    for message, is_invalid in INPUT_CHECKS:
+        invalid = np.flatnonzero(is_invalid(table))
+        if len(invalid) and len(table['days']) == 1:
+            raise ValueError(message)
+        if len(invalid):
+            raise ValueError(f"{message} (vehicle {invalid[0]}" + (f" and {len(invalid) - 1} more)" if len(invalid) > 1 else ")"))
+
+def validate_input(args):
+    validate_inputs(input_table([args]))
+
+def format_time(time_float):
+    """Converts time in float format to HH:MM format"""
+    hours = int(time_float)
+    minutes = int((time_float - hours) * 60)
+    return f"{hours:02d}:{minutes:02d}"
+
+def sample_commute_times(args, rng):
+    """Sample departure and arrival times for commuting, ensuring consistency"""
+    t_dep_hour = rng.uniform(args.C_dept - 0.25, args.C_dept + 0.25)  # Departure time with small variance
+    t_arr_hour = rng.uniform(args.C_arr - 0.25, args.C_arr + 0.25)  # Arrival time with small variance
+
+    while t_arr_hour <= t_dep_hour:
+        t_arr_hour = rng.uniform(args.C_arr - 0.25, args.C_arr + 0.25)
+
+    return t_dep_hour, t_arr_hour
+
+def sample_non_commute_times(args, rng):
+    """Randomly sample departure and arrival times for non-commuting trips, ensuring consistency"""
+    t_dep_hour = rng.uniform(8, 20)  # Assuming non-commuting trips can start between 8 AM and 8 PM
+    trip_duration = rng.uniform(1, 2)  # Duration between 1 and 2 hours
+    t_arr_hour = t_dep_hour + trip_duration
+
+    if t_arr_hour >= 24:
+        t_arr_hour -= 24
+
+    return t_dep_hour, t_arr_hour
+
+def sample_commute_times_batch(args, rng, size):
+    """Sample size commute departure and arrival times at once, arrivals are drawn after their departure"""
+    t_dep_hour = rng.uniform(args.C_dept - 0.25, args.C_dept + 0.25, size)
+    # redrawing until the arrival is after the departure, as sample_commute_times does, gives a uniform
+    # arrival between the departure and the latest arrival, which can be drawn directly
+    t_arr_low = np.maximum(args.C_arr - 0.25, t_dep_hour)
+    t_arr_hour = rng.uniform(t_arr_low, args.C_arr + 0.25)
+    return t_dep_hour, t_arr_hour
+
+def sample_non_commute_times_batch(args, rng, size):
+    """Sample size non-commuting departure and arrival times at once, arrivals after midnight wrap like sample_non_commute_times"""
+    t_dep_hour = rng.uniform(8, 20, size)
+    t_arr_hour = t_dep_hour + rng.uniform(1, 2, size)
+    t_arr_hour[t_arr_hour >= 24] -= 24
+    return t_dep_hour, t_arr_hour
+
+class CommuteTrips:
+    """One commute on every commute day of the calendar"""
+    def sample(self, args, rng, days, weekday, is_commute_day):
+        commute_days = days[is_commute_day]
+        n_commute = len(commute_days)
+        commute_dist = rng.uniform(args.C_dist - args.C_dist * 0.1, args.C_dist + args.C_dist * 0.1, n_commute)
+        t_dep, t_arr = sample_commute_times_batch(args, rng, n_commute)
+        travel_time = np.full(n_commute, (args.C_arr - args.C_dept) * 60)
+        return commute_days, t_dep, t_arr, commute_dist, travel_time
+
+class RandomNonCommuteTrips:
+    """A Poisson number of non-commuting round trips per day (N_nc per week) at random times, on the given weekdays"""
+    def __init__(self, weekdays=range(7)):
+        self.on_weekday = np.isin(np.arange(7), list(weekdays))
+
+    def sample(self, args, rng, days, weekday, is_commute_day):
+        num_trips = rng.poisson(args.N_nc / 7, len(days)) * self.on_weekday[weekday]
+        trip_days = np.repeat(days, num_trips)
+        t_dep, t_arr = sample_non_commute_times_batch(args, rng, len(trip_days))
+        # trips may end after midnight, the duration is taken modulo 24 h
+        travel_time_hours = ((t_arr - t_dep) % 24) * DRIVING_SHARE
+        return trip_days, t_dep, t_arr, travel_time_hours * AVERAGE_SPEED_KMH, travel_time_hours * 60
+
+class FixedNonCommuteTrips:
+    """The non-commuting trips given per weekday by DayTrips, None for weekdays without fixed trips"""
+    def __init__(self, day_trips):
+        self.num_trips = np.array([trip.num_trips if trip is not None else 0 for trip in day_trips])
+        self.t_dep = np.array([trip.t_dep if trip is not None else 0.0 for trip in day_trips], dtype=float)
+        self.t_arr = np.array([trip.t_arr if trip is not None else 0.0 for trip in day_trips], dtype=float)
+        self.dist = np.array([trip.dist if trip is not None else 0.0 for trip in day_trips], dtype=float)
+
+    def sample(self, args, rng, days, weekday, is_commute_day):
+        num_trips = self.num_trips[weekday]
+        trip_weekday = np.repeat(weekday, num_trips)
+        t_dep, t_arr = self.t_dep[trip_weekday], self.t_arr[trip_weekday]
+        travel_time_hours = ((t_arr - t_dep) % 24) * DRIVING_SHARE
+        return np.repeat(days, num_trips), t_dep, t_arr, self.dist[trip_weekday], travel_time_hours * 60
+
+class EmpiricalNonCommuteTrips:
+    """Non-commuting trips drawn from an EmpiricalModel fitted to reference traces, on the given weekdays"""
+    def __init__(self, model, weekdays=range(7)):
+        self.model = model
+        self.on_weekday = np.isin(np.arange(7), list(weekdays))
+
+    def sample(self, args, rng, days, weekday, is_commute_day):
+        on_weekday = self.on_weekday[weekday]
+        return self.model.sample(rng, days[on_weekday], weekday[on_weekday])
+
+def empirical_model(args):
+    """The EmpiricalModel given by --empirical, None without one"""
+    file_name = getattr(args, 'empirical', None)
+    if not file_name:
+        return None
+    # the server and fleet workers simulate many vehicles with the same model, it is read once per file version
+    return cached_model(file_name, os.path.getmtime(file_name) if os.path.exists(file_name) else None)
+
+@functools.lru_cache(maxsize=8)
+def cached_model(file_name, mtime):
+    return load_model(file_name)
+
+def trip_stages(day_trips=None, empirical=None):
+    """Commutes plus fixed non-commuting trips on the weekdays with DayTrips, random ones on all other weekdays.
+    The random trips are drawn from the EmpiricalModel empirical instead of the built-in assumptions if given."""
+    def non_commute_trips(weekdays=range(7)):
+        return RandomNonCommuteTrips(weekdays) if empirical is None else EmpiricalNonCommuteTrips(empirical, weekdays)
+    if day_trips is None or all(trip is None for trip in day_trips):
+        return [CommuteTrips(), non_commute_trips()]
+    random_weekdays = [i for i, trip in enumerate(day_trips) if trip is None]
+    return [CommuteTrips(), FixedNonCommuteTrips(day_trips), non_commute_trips(random_weekdays)]
+
+def hours_to_minutes(hours):
+    """Truncates times in hours to whole minutes, like format_time"""
+    whole_hours = hours.astype(np.int64)
+    return whole_hours * 60 + ((hours - whole_hours) * 60).astype(np.int64)
+
+def sample_days(args, ev, rng, stages, days, week_day, is_commute_day, carry=None):
+    """Samples the trips of the given days in one pass and returns them as a trip_dtype() record array,
+    a day without trips gets one record with a dep_min of -1. With a SocCarryOver the SOC continues from
+    the previous days instead of starting full every morning."""
+    with PROFILER.stage('sample'):
+        sampled = [stage.sample(args, rng, days, week_day, is_commute_day) for stage in stages]
+        trip_day, t_dep, t_arr, dist, travel_time = (np.concatenate(values) for values in zip(*sampled))
+        is_commute = np.concatenate([np.full(len(values[0]), isinstance(stage, CommuteTrips)) for stage, values in zip(stages, sampled)])
+        # trips of earlier stages come first within a day, the stable sort keeps that order. A carried SOC
+        # follows the trips in the order they are driven instead.
+        order = np.argsort(trip_day, kind='stable') if carry is None else np.lexsort((t_dep, trip_day))
+        trip_day, t_dep, t_arr, dist, travel_time, is_commute = (values[order] for values in (trip_day, t_dep, t_arr, dist, travel_time, is_commute))
+    with PROFILER.stage('soc'):
+        energy_used = (dist * ev.consumption) / 1000
+        soc_floor = ev.min_soc * ev.battery_size
+        soc_full = ev.max_soc * ev.battery_size
+
+        first_day = int(days[0])
+        empty_days = days[np.bincount(trip_day - first_day, minlength=len(days)) == 0]
+        if carry is None:
+            # SOC drops by the cumulative energy used since the start of the day, clipped at min SOC
+            cumulative = np.cumsum(energy_used)
+            first_of_day = np.r_[True, trip_day[1:] != trip_day[:-1]][:len(trip_day)]
+            day_index = np.cumsum(first_of_day) - 1
+            used_today = cumulative - (cumulative - energy_used)[first_of_day][day_index]
+            soc_end = np.maximum(soc_full - used_today, soc_floor)
+            soc_start = np.maximum(soc_full - (used_today - energy_used), soc_floor)
+            floor_hit = np.zeros(len(trip_day), dtype=bool)
+            idle_soc = np.full(len(empty_days), soc_full)
+        else:
+            # the commute travel time is the whole time away from home, the car is parked at work for the part
+            # of it that is not spent driving
+            work_hours = np.maximum(t_arr - t_dep - dist / AVERAGE_SPEED_KMH, 0)
+            soc_start, soc_end, floor_hit, idle_soc = carry.balance(days, trip_day, t_dep, t_arr, energy_used, is_commute, work_hours)
+            idle_soc = idle_soc[np.isin(days, empty_days)]
+
+    PROFILER.count('days', len(days))
+    PROFILER.count('trips', len(trip_day))
+    with PROFILER.stage('records'):
+        trips = np.empty(len(trip_day) + len(empty_days), dtype=trip_dtype())
+        n_trips = len(trip_day)
+        trips['day'] = np.r_[trip_day, empty_days] + 1
+        trips['weekday'] = week_day[trips['day'] - 1 - first_day]
+        trips['dep_min'] = np.r_[hours_to_minutes(t_dep), np.full(len(empty_days), -1)]
+        trips['arr_min'] = np.r_[hours_to_minutes(t_arr), np.full(len(empty_days), -1)]
+        trips['soc_dep'] = np.r_[soc_start, idle_soc]
+        trips['soc_arr'] = np.r_[soc_end, idle_soc]
+        trips['distance'] = np.r_[dist, np.full(len(empty_days), np.nan)]
+        trips['travel_time'] = np.r_[travel_time, np.full(len(empty_days), np.nan)]
+        trips['floor_hit'] = np.r_[floor_hit, np.zeros(len(empty_days), dtype=bool)]
+        trips = trips[np.argsort(trips['day'], kind='stable')]
+        if getattr(args, 'merge', False):
+            trips = as_records(merge_columns({**as_columns(trips), 'floor_hit': trips['floor_hit']}))
+    return trips
+
+def trips_to_trip_data(trips):
+    """Formats a trip_dtype() record array as the simulators' [(day, [trip, ...]), ...] output"""
+    trip_data = []
+    fields = [trips[name].tolist() for name in COLUMNS]
+    for day, weekday, dep, arr, soc_dep, soc_arr, distance, travel_time in zip(*fields):
+        if not trip_data or trip_data[-1][0] != day:
+            trip_data.append((day, []))
+        weekday = WEEKDAYS[weekday]
+        if dep < 0:
+            trip = (weekday, "No trips", f"{soc_dep:.2f}", "", f"{soc_arr:.2f}")
+        else:
+            trip = (weekday, f"{dep // 60:02d}:{dep % 60:02d}", f"{soc_dep:.2f}", f"{arr // 60:02d}:{arr % 60:02d}", f"{soc_arr:.2f}", f"{distance:.2f}", round(travel_time))
+        trip_data[-1][1].append(trip)
+    return trip_data
+
+def iter_trips(args, ev, rng=None, stages=None, chunk_days=CHUNK_DAYS, state=None):
+    """Draws the horizon chunk_days at a time and yields one trip_dtype() record array per chunk. With a
+    TraceState only the days after state.days are drawn, continuing its generator, holidays and SOC, and
+    the state is advanced to the end of the horizon once the last chunk has been drawn."""
+    rng = make_rng(getattr(args, 'seed', None) if rng is None else rng)
+    start_day = 0
+    if state is not None:
+        rng, start_day = state.rng(rng), state.days
+    stages = trip_stages(empirical=empirical_model(args)) if stages is None else stages
+    with PROFILER.stage('calendar'):
+        weekday, is_commute_day, holiday_plan = build_calendar(args, rng, None if state is None else state.holiday_plan)
+    carry = SocCarryOver(ev, getattr(args, 'home_charger_kw', 0.0), getattr(args, 'work_charger_kw', 0.0)) if getattr(args, 'carry_soc', False) else None
+    if state is not None:
+        state.restore(carry)
+    for first_day in range(start_day, args.days, chunk_days):
+        days = np.arange(first_day, min(first_day + chunk_days, args.days))
+        yield sample_days(args, ev, rng, stages, days, weekday[days], is_commute_day[days], carry)
+    if state is not None:
+        state.advance(args.days, rng, holiday_plan, carry)
+
+def generate_trips(args, ev, rng=None, stages=None):
+    """All trips of the horizon as one trip_dtype() record array"""
+    return np.concatenate(list(iter_trips(args, ev, rng, stages)))
+
+def iter_trip_data(args, ev, rng=None, stages=None, chunk_days=CHUNK_DAYS):
+    """Yields formatted (day, trips) pairs one day at a time, drawing chunk_days at once"""
+    for trips in iter_trips(args, ev, rng, stages, chunk_days):
+        yield from trips_to_trip_data(trips)
+
+def generate_trip_data(args, ev, rng=None, stages=None):
+    return list(iter_trip_data(args, ev, rng, stages))
+
+def write_to_csv(file_name, data):
+    """Writes (day, trips) pairs as they arrive, data can be a list or a generator"""
+    with open(file_name, mode='w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(HEADER)
+        rows = []
+        for day, trips in data:
+            rows.extend([day, *trip] for trip in trips)
+            if len(rows) >= BUFFER_ROWS:
+                writer.writerows(rows)
+                rows = []
+        writer.writerows(rows)
+
+def iter_simulation(args, rng=None, stages=None):
+    """Validates the inputs and returns a generator over the (day, trips) pairs"""
+    validate_input(args)
+    ev = ElectricVehicle(args.ev_battery, args.max_soc, args.min_soc, args.consumption)
+    return iter_trip_data(args, ev, rng, stages)
+
+def simulate_trips(variant, args, rng=None, stages=None):
+    """Validates the inputs and returns all trips as one trip_dtype() record array, seeded runs without an
+    explicit generator are looked up in the result cache"""
+    validate_input(args)
+    ev = ElectricVehicle(args.ev_battery, args.max_soc, args.min_soc, args.consumption)
+    if rng is None:
+        return cached_run(variant, args, lambda args: generate_trips(args, ev, stages=stages))
+    return generate_trips(args, ev, rng, stages)
+
+def run_simulation(variant, args, rng=None, stages=None):
+    return trips_to_trip_data(simulate_trips(variant, args, rng, stages))
+
+def main(variant, args, stages=None):
+    with profiled(f"ev_simulation ({variant})", getattr(args, 'profile', None), getattr(args, 'cprofile', None)):
+        write_simulation(variant, args, stages)
+
+def write_simulation(variant, args, stages=None):
+    """Simulates and writes args.output, plus the floor hits of a carried SOC"""
+    if getattr(args, 'extend', False):
+        extend_simulation(variant, args, stages)
+        return
+    if is_cacheable(args):
+        chunks = [simulate_trips(variant, args, stages=stages)]
+    else:
+        validate_input(args)
+        ev = ElectricVehicle(args.ev_battery, args.max_soc, args.min_soc, args.consumption)
+        chunks = iter_trips(args, ev, stages=stages)
+    write_chunks(args, chunks)
+
+def write_chunks(args, chunks, append=False):
+    """Writes the trips to args.output and, with a carried SOC, the trips that hit min SOC to the floor output"""
+    if not getattr(args, 'carry_soc', False):
+        write_trips(args.output, chunks, getattr(args, 'format', 'csv'), append)
+        return
+    floor_hits = []
+    def collect_floor_hits(chunks):
+        for trips in chunks:
+            floor_hits.append(trips[trips['floor_hit']])
+            yield trips
+    write_trips(args.output, collect_floor_hits(chunks), getattr(args, 'format', 'csv'), append)
+    write_trips(floor_output(args), floor_hits, 'csv', append)
+
+def floor_output(args):
+    return args.floor_output or f"{os.path.splitext(args.output)[0]}_floor_hits.csv"
+
+def extend_simulation(variant, args, stages=None):
+    """Writes args.output with a continuation state, or appends the days beyond those already in it"""
+    validate_input(args)
+    ev = ElectricVehicle(args.ev_battery, args.max_soc, args.min_soc, args.consumption)
+    state_file = state_path(args.output)
+    state = read_state(state_file)
+    if state is None or not os.path.exists(args.output):
+        state = TraceState(variant, trace_params(args))
+    state.check(variant, args)
+    if state.days == args.days:
+        return
+    fmt = getattr(args, 'format', 'csv')
+    carry_soc = getattr(args, 'carry_soc', False)
+    if state.days > 0:
+        # days written by an interrupted run, after the state was last saved, are dropped again
+        truncate_trace(args.output, state.days, state.sizes.get('output'), fmt)
+        if carry_soc:
+            truncate_trace(floor_output(args), None, state.sizes.get('floor_output'), 'csv')
+    write_chunks(args, iter_trips(args, ev, stages=stages, state=state), append=state.days > 0)
+    state.sizes = {'output': trace_size(args.output, fmt)}
+    if carry_soc:
+        state.sizes['floor_output'] = trace_size(floor_output(args), 'csv')
+    write_state(state_file, state)
+
+def build_parser(N_nc=3):
+    """Parser with the arguments shared by both simulators"""
+    parser = argparse.ArgumentParser(description='Sample synthetic EV usage data.')
+    parser.add_argument('--output', type=str, default='ev_usage.csv', help='Output file name')
+    parser.add_argument('--days', type=int, default=365, help='Desired number of days sampled')
+    parser.add_argument('--ev_battery', type=float, default=40, help='EV battery size in kWh')
+    parser.add_argument('--max_soc', type=float, default=0.8, help='Maximum state of charge')
+    parser.add_argument('--min_soc', type=float, default=0.2, help='Minimum state of charge')
+    parser.add_argument('--consumption', type=float, default=164, help='Consumption in Wh/km')
+    parser.add_argument('--wfh_monday', type=int, default=0, choices=[0, 1], help='WFH on Monday')
+    parser.add_argument('--wfh_tuesday', type=int, default=0, choices=[0, 1], help='WFH on Tuesday')
+    parser.add_argument('--wfh_wednesday', type=int, default=0, choices=[0, 1], help='WFH on Wednesday')
+    parser.add_argument('--wfh_thursday', type=int, default=0, choices=[0, 1], help='WFH on Thursday')
+    parser.add_argument('--wfh_friday', type=int, default=0, choices=[0, 1], help='WFH on Friday')
+    parser.add_argument('--C_dist', type=float, default=20.0, help='Typical return commute distance in km')
+    parser.add_argument('--C_dept', type=float, default=7.45, help='Departure time for commuting')
+    parser.add_argument('--C_arr', type=float, default=17.30, help='Arrival time from commuting')
+    parser.add_argument('--N_nc', type=int, default=N_nc, help='Weekly number of non-commuting round trips')
+    parser.add_argument('--N_hw', type=int, default=6, help='Number of holiday weeks per year')
+    parser.add_argument('--start_date', type=str, help='Date of the first simulated day (YYYY-MM-DD), uses real weekdays and ISO weeks')
+    parser.add_argument('--public_holidays', type=str, help='Comma-separated public holidays (YYYY-MM-DD) without a commute, requires --start_date')
+    parser.add_argument('--carry_soc', action='store_true', help='Carry the SOC across days instead of starting every day full, charging at home over night and at work')
+    parser.add_argument('--home_charger_kw', type=float, default=7.4, help='Home charger power in kW with --carry_soc, 0 for no home charging')
+    parser.add_argument('--work_charger_kw', type=float, default=0.0, help='Workplace charger power in kW on commute days with --carry_soc')
+    parser.add_argument('--floor_output', type=str, help='CSV receiving the trips that ran into min SOC with --carry_soc, defaults to <output>_floor_hits.csv')
+    parser.add_argument('--empirical', type=str, help='Draw the non-commuting trips from an empirical model fitted by empirical.py instead of N_nc random trips')
+    parser.add_argument('--extend', action='store_true', help='Keep the generator state next to the output and only simulate and append the days beyond those already written')
+    parser.add_argument('--merge', action='store_true', help='Merge overlapping trips of a day before writing them')
+    parser.add_argument('--seed', type=int, help='Seed of the random number generator, makes runs reproducible')
+    parser.add_argument('--no-cache', dest='no_cache', action='store_true', help='Always regenerate seeded runs instead of loading them from the result cache')
+    parser.add_argument('--cache_dir', type=str, help='Directory of the result cache, defaults to ~/.cache/spaghetti')
+    parser.add_argument('--cache_size', type=float, default=DEFAULT_CACHE_SIZE_MB, help='Size limit of the result cache in MB')
+    parser.add_argument('--format', type=str, default='csv', choices=FORMATS, help='Output format, npz, parquet and store (a memory-mapped fleet store) keep typed columns instead of text')
+    parser.add_argument('--profile', type=str, help='Write a JSON summary of the time spent per stage to this file (- for stderr), also enabled by SPAGHETTI_PROFILE')
+    parser.add_argument('--cprofile', type=str, help='Dump cProfile statistics (pstats) of the run to this file')
+    return parser
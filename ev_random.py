@@ -0,0 +1,19 @@
+# Random number generation. All sampling goes through one numpy Generator that is passed down explicitly,
+# so seeded runs are reproducible and parallel runs never share global random state.
+import numpy as np
+
+def make_rng(seed=None):
+    """Returns a Generator for an int seed, a SeedSequence or None (fresh entropy), Generators are passed through"""
+    if isinstance(seed, np.random.Generator):
+        return seed
+    return np.random.default_rng(seed)
+
+def spawn_seeds(seed, count):
+    """Spawns count independent child SeedSequences, e.g. one per vehicle of a batch run"""
+    return np.random.SeedSequence(seed).spawn(count)
+
+def restore_rng(state):
+    """Returns a Generator continuing from a bit generator state saved with generator.bit_generator.state"""
+    bit_generator = getattr(np.random, state['bit_generator'])()
+    bit_generator.state = state
+    return np.random.Generator(bit_generator)
@@ -0,0 +1,85 @@
+# SOC carried across days. Instead of starting every morning full, the battery is charged at home over night
+# (between the last arrival of one day and the first departure of the next) and at work on commute days, at
+# the given charger powers and never beyond max SOC. Every trip is an event that first charges and then uses
+# energy, s_k = min(s_(k-1) + charge_k, cap) - use_k, which only has a cap from above and therefore a closed form
+# over whole arrays: with D the cumulative sum of charge - use, s_k = D_k + min(s_0, min_(j<=k)(cap - use_j - D_j)).
+# Trips that would run below min SOC are clipped to it and flagged, from the first of them on the events are
+# balanced in one sequential pass.
+import numpy as np
+
+# a commute is split into an outward and a return half with the workplace charge in between
+COMMUTE_LEGS = 2
+
+def capped_balance(charge, use, cap, soc_start):
+    """SOC after every event of s_k = min(s_(k-1) + charge_k, cap) - use_k, starting from soc_start"""
+    net = np.cumsum(charge - use)
+    return net + np.minimum(soc_start, np.minimum.accumulate(cap - use - net))
+
+def sequential_balance(charge, use, cap, floor, soc_start):
+    """floor_balance one event after the other, returns the SOC after every event and which events hit the floor"""
+    soc, hit = np.empty(len(charge)), np.zeros(len(charge), dtype=bool)
+    level = soc_start
+    for k, (charged, used) in enumerate(zip(charge.tolist(), use.tolist())):
+        level = min(level + charged, cap) - used
+        if level < floor:
+            level, hit[k] = floor, True
+        soc[k] = level
+    return soc, hit
+
+def floor_balance(charge, use, cap, floor, soc_start):
+    """capped_balance that stops at floor, returns the SOC after every event and which events hit the floor"""
+    soc = capped_balance(charge, use, cap, soc_start)
+    hit = np.zeros(len(soc), dtype=bool)
+    below = np.flatnonzero(soc < floor)
+    if len(below):
+        # the closed form holds up to the first hit, the events from there on are balanced one by one
+        k = below[0]
+        soc[k:], hit[k:] = sequential_balance(charge[k:], use[k:], cap, floor, soc[k - 1] if k else soc_start)
+    return soc, hit
+
+class SocCarryOver:
+    """Battery state carried from one chunk of days to the next"""
+    def __init__(self, ev, home_charger_kw=0.0, work_charger_kw=0.0):
+        self.cap = ev.max_soc * ev.battery_size
+        self.floor = ev.min_soc * ev.battery_size
+        self.home_charger_kw = home_charger_kw
+        self.work_charger_kw = work_charger_kw
+        self.soc = self.cap
+        # hour of the last arrival counted from the start of the horizon, nan before the first trip
+        self.last_arrival = np.nan
+
+    def balance(self, days, trip_day, t_dep, t_arr, energy_used, is_commute, work_hours):
+        """SOC on departure and arrival of trips sorted by day and whether they hit min SOC, plus the SOC at the
+        end of the given days without trips, advances the state to the end of the days"""
+        n = len(trip_day)
+        dep = trip_day * 24 + t_dep
+        # trips arriving after midnight end on the next day
+        arr = trip_day * 24 + np.where(t_arr < t_dep, t_arr + 24, t_arr)
+        previous_arrival = np.r_[self.last_arrival, arr[:-1]]
+        overnight = np.r_[True, trip_day[1:] != trip_day[:-1]][:n] & ~np.isnan(previous_arrival)
+        home_charge = np.where(overnight, self.home_charger_kw * np.maximum(np.nan_to_num(dep - previous_arrival), 0), 0)
+
+        legs = np.where(is_commute, COMMUTE_LEGS, 1)
+        event_trip = np.repeat(np.arange(n), legs)
+        first_leg = np.r_[0, np.cumsum(legs)[:-1]].astype(np.int64)[:n]
+        charge = np.zeros(len(event_trip))
+        charge[first_leg] = home_charge
+        charge[first_leg[is_commute] + 1] = self.work_charger_kw * work_hours[is_commute]
+        use = (energy_used / legs)[event_trip]
+
+        soc, hit = floor_balance(charge, use, self.cap, self.floor, self.soc)
+        soc_start = np.minimum(np.r_[self.soc, soc[:-1]][first_leg] + home_charge, self.cap)
+        soc_end = soc[first_leg + legs - 1]
+        floor_hit = np.logical_or.reduceat(hit, first_leg) if n else np.zeros(0, dtype=bool)
+
+        # a day without trips ends with the SOC of the previous arrival plus the home charging since
+        previous = np.searchsorted(trip_day, days) - 1
+        idle_soc = np.where(previous >= 0, soc_end[np.maximum(previous, 0)] if n else 0, self.soc)
+        since = np.where(previous >= 0, arr[np.maximum(previous, 0)] if n else 0, self.last_arrival)
+        charged = self.home_charger_kw * np.maximum((days + 1) * 24 - since, 0)
+        idle_soc = np.where(np.isnan(since), self.cap, np.minimum(idle_soc + np.nan_to_num(charged), self.cap))
+
+        if n:
+            self.soc = soc[-1]
+            self.last_arrival = arr[-1]
+        return soc_start, soc_end, floor_hit, idle_soc
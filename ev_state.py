@@ -0,0 +1,97 @@
+# Continuation state of a trace. With --extend the simulators keep everything needed to draw the days after
+# the last written one in a JSON file next to the output: the random generator state, the number of days
+# written, the holiday plan of the years drawn so far and the carried SOC. A later run with a longer --days
+# then only simulates the new days and appends them, so growing a study horizon does not regenerate the trace.
+# The extended trace continues the same random stream, but as the holiday weeks of the new years are drawn
+# when they are reached, it is not identical to a single run of the longer horizon.
+import json
+import os
+import numpy as np
+from ev_random import restore_rng
+
+STATE_VERSION = 1
+# arguments that may change between the runs extending one trace
+VOLATILE_ARGS = {'days', 'extend', 'output', 'no_cache', 'cache_dir', 'cache_size', 'profile', 'cprofile'}
+
+def state_path(output):
+    return f"{output}.state.json"
+
+def trace_params(args):
+    """The arguments that define a trace and must stay the same when it is extended"""
+    return {key: value for key, value in vars(args).items() if key not in VOLATILE_ARGS}
+
+class TraceState:
+    def __init__(self, variant, params, days=0, rng_state=None, holiday_plan=None, soc=None, last_arrival=None, sizes=None):
+        self.variant = variant
+        self.params = params
+        self.days = days
+        self.rng_state = rng_state
+        self.holiday_plan = holiday_plan
+        self.soc = soc
+        self.last_arrival = last_arrival
+        # byte sizes of the CSV outputs once the days were written, an interrupted append is cut back to them
+        self.sizes = sizes or {}
+
+    def rng(self, default):
+        """The generator continuing the trace, default for a trace without days yet"""
+        return default if self.rng_state is None else restore_rng(self.rng_state)
+
+    def restore(self, carry):
+        """Continues a SocCarryOver from the carried SOC of the last written day"""
+        if carry is not None and self.soc is not None:
+            carry.soc = self.soc
+            carry.last_arrival = np.nan if self.last_arrival is None else self.last_arrival
+
+    def advance(self, days, rng, holiday_plan, carry):
+        """Records the state after the first days of the trace have been drawn"""
+        self.days = days
+        self.rng_state = rng.bit_generator.state
+        self.holiday_plan = holiday_plan
+        if carry is not None:
+            self.soc = float(carry.soc)
+            self.last_arrival = None if np.isnan(carry.last_arrival) else float(carry.last_arrival)
+
+    def check(self, variant, args):
+        """Raises ValueError if args do not continue this trace"""
+        if variant != self.variant:
+            raise ValueError(f"The trace was generated by the {self.variant} simulator, not the {variant} one")
+        params = trace_params(args)
+        changed = sorted(key for key in set(self.params) | set(params) if self.params.get(key) != params.get(key))
+        if changed:
+            raise ValueError(f"Only --days may change when extending a trace, changed: {', '.join(changed)}")
+        if args.days < self.days:
+            raise ValueError(f"The trace already has {self.days} days, --days cannot shrink it")
+
+    def to_dict(self):
+        return {
+            'version': STATE_VERSION,
+            'variant': self.variant,
+            'params': self.params,
+            'days': self.days,
+            'rng_state': self.rng_state,
+            'holiday_plan': None if self.holiday_plan is None else self.holiday_plan.tolist(),
+            'soc': self.soc,
+            'last_arrival': self.last_arrival,
+            'sizes': self.sizes
+        }
+
+def read_state(file_name):
+    """The TraceState stored in file_name, None if there is none"""
+    if not os.path.exists(file_name):
+        return None
+    with open(file_name, mode='r') as file:
+        data = json.load(file)
+    if data.get('version') != STATE_VERSION:
+        raise ValueError(f"{file_name} is a trace state of version {data.get('version')}, expected {STATE_VERSION}")
+    holiday_plan = data['holiday_plan']
+    if holiday_plan is not None:
+        holiday_plan = np.array(holiday_plan, dtype=np.int64)
+    return TraceState(data['variant'], data['params'], data['days'], data['rng_state'], holiday_plan, data['soc'], data['last_arrival'],
+                      data.get('sizes'))
+
+def write_state(file_name, state):
+    """Writes the state atomically, so an interrupted run keeps the previous one"""
+    tmp_name = f"{file_name}.tmp"
+    with open(tmp_name, mode='w') as file:
+        json.dump(state.to_dict(), file)
+    os.replace(tmp_name, file_name)
@@ -0,0 +1,107 @@
+# Simulates a whole fleet of vehicles in one call, one vehicle per task on a process pool.
+# Each vehicle gets its own random stream spawned from a single SeedSequence, so fleet runs are reproducible.
+import argparse
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+import ev_simulation
+import ev_simulation_extended
+from ev_engine import trips_to_trip_data
+from ev_random import make_rng, spawn_seeds
+from trace_io import FORMATS, write_trips
+
+VARIANTS = {
+    'simple': ev_simulation,
+    'extended': ev_simulation_extended
+}
+# name of the single store that replaces the per-vehicle files with --format store
+FLEET_STORE = 'fleet.store'
+
+def vehicle_args(variant, params):
+    """Builds the argparse Namespace of one vehicle from the CLI defaults and its parameters"""
+    parser = VARIANTS[variant].build_parser()
+    defaults = parser.parse_args([])
+    argv = []
+    flags = {}
+    for key, value in params.items():
+        if value is None or value == "":
+            continue
+        # on/off switches such as --merge take no value on the command line
+        if isinstance(getattr(defaults, key, None), bool):
+            flags[key] = value in (True, 1, '1', 'True', 'true')
+        else:
+            argv.extend([f"--{key}", str(value)])
+    args = parser.parse_args(argv)
+    vars(args).update(flags)
+    return args
+
+def simulate_vehicle_trips(task):
+    """Simulates one vehicle and returns its trips as a trip_dtype() record array"""
+    variant, params, seed = task
+    # scenario files hand over ready-made Namespaces, vehicle tables plain parameter dicts
+    args = params if isinstance(params, argparse.Namespace) else vehicle_args(variant, params)
+    # a seed given in the vehicle table takes precedence over the spawned stream, and lets the result cache answer
+    if args.seed is not None:
+        return VARIANTS[variant].simulate_trips(args)
+    return VARIANTS[variant].simulate_trips(args, make_rng(seed))
+
+def simulate_vehicle(task):
+    return trips_to_trip_data(simulate_vehicle_trips(task))
+
+def iter_fleet_trips(vehicles, variant='simple', seed=None, workers=None, chunksize=None):
+    """Simulates every vehicle of the table and yields (index, trips) in table order, trips as record arrays"""
+    if variant not in VARIANTS:
+        raise ValueError(f"Unknown simulator variant: {variant}")
+    vehicles = list(vehicles)
+    seeds = spawn_seeds(seed, len(vehicles))
+    tasks = [(variant, params, vehicle_seed) for params, vehicle_seed in zip(vehicles, seeds)]
+    if chunksize is None:
+        # a few batches per worker keep the pool balanced without one IPC round trip per vehicle
+        chunksize = max(len(tasks) // ((workers or os.cpu_count() or 1) * 4), 1)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from enumerate(executor.map(simulate_vehicle_trips, tasks, chunksize=chunksize))
+
+def run_fleet(vehicles, variant='simple', seed=None, workers=None, chunksize=None):
+    """Simulates every vehicle of the table and yields (index, trip_data) in table order"""
+    for index, trips in iter_fleet_trips(vehicles, variant, seed, workers, chunksize):
+        yield index, trips_to_trip_data(trips)
+
+def read_vehicle_table(file_name):
+    """Reads per-vehicle parameters from a CSV file whose columns are the simulator arguments"""
+    with open(file_name, mode='r', newline='') as file:
+        return list(csv.DictReader(file))
+
+def write_fleet(results, output_dir, fmt='csv'):
+    """Writes the (index, trips) pairs of iter_fleet_trips to ev_data_<index> files in output_dir, or all
+    vehicles in table order to one fleet store in output_dir"""
+    os.makedirs(output_dir, exist_ok=True)
+    if fmt == 'store':
+        from fleet_store import write_store
+        write_store(os.path.join(output_dir, FLEET_STORE), ([trips] for _, trips in results))
+        return
+    for index, trips in results:
+        write_trips(os.path.join(output_dir, f"ev_data_{index}.{fmt}"), [trips], fmt)
+
+def main(args):
+    vehicles = read_vehicle_table(args.vehicles)
+    write_fleet(iter_fleet_trips(vehicles, args.variant, args.seed, args.workers, args.chunksize), args.output_dir, args.format)
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Sample synthetic EV usage data for a fleet of vehicles.')
+    parser.add_argument('--vehicles', type=str, required=True, help='CSV table with one row of simulator arguments per vehicle')
+    parser.add_argument('--output_dir', type=str, default='fleet', help='Directory receiving one output file per vehicle')
+    parser.add_argument('--variant', type=str, default='simple', choices=list(VARIANTS), help='Simulator used for every vehicle')
+    parser.add_argument('--format', type=str, default='csv', choices=FORMATS, help='Format of the output files, store writes one fleet store instead of a file per vehicle')
+    parser.add_argument('--seed', type=int, help='Root seed from which the per-vehicle seeds are spawned')
+    parser.add_argument('--workers', type=int, help='Number of worker processes, defaults to the number of CPUs')
+    parser.add_argument('--chunksize', type=int, help='Number of vehicles sent to a worker at once, defaults to a quarter of the vehicles per worker')
+    return parser
+
+
+if __name__ == '__main__':
+    parser = build_parser()
+    args = parser.parse_args()
+    try:
+        main(args)
+    except ValueError as e:
+        print(f"Input Error: {e}")
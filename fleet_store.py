@@ -0,0 +1,186 @@
+# Fleet trace store: the trips of a whole fleet in one trip_dtype() record array (trips.npy), with offset indexes
+# per vehicle and per day, so the trips of any vehicle or of any day range of a vehicle are a slice of the
+# memory-mapped array. Nothing is parsed or copied when a store is opened, the pages of the slices an energy
+# model asks for are the only ones read from disk.
+#
+# Layout of a store directory:
+# trips.npy            all trips, vehicle after vehicle, every vehicle's trips ordered by day
+# vehicle_offsets.npy  row of the first trip of every vehicle, plus the total number of rows
+# first_day.npy        day number of the first day of every vehicle
+# day_index.npy        position of every vehicle's first day in day_offsets, plus the total number of entries
+# day_offsets.npy      row of the first trip of every day, every vehicle's days followed by its end row
+# meta.json            format version and sizes, written last, a store without it is incomplete
+import json
+import os
+import numpy as np
+from profiling import PROFILER
+from trace_io import STORE_META, as_columns, is_store, trip_dtype
+
+STORE_VERSION = 1
+META_FILE = STORE_META
+TRIPS_FILE = 'trips.npy'
+INDEX_FILES = ['vehicle_offsets', 'first_day', 'day_index', 'day_offsets']
+# bytes reserved for the .npy header of trips.npy, whose length is only known once all trips are written
+HEADER_BYTES = 1024
+
+def npy_header(dtype, rows):
+    """.npy (version 1.0) header of a one-dimensional array padded to HEADER_BYTES"""
+    header = repr({'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': (rows,)})
+    prefix = np.lib.format.magic(1, 0)
+    length = HEADER_BYTES - len(prefix) - 2
+    return prefix + length.to_bytes(2, 'little') + header.ljust(length - 1).encode('latin1') + b'\n'
+
+class StoreWriter:
+    """Streams the trips of one vehicle after the other into a new store, or further days of its last
+    vehicle into an existing store with append"""
+    def __init__(self, path, append=False):
+        self.path = path
+        self.dtype = trip_dtype()
+        if append:
+            store = FleetStore(path)
+            self.vehicle_offsets, self.first_day, self.day_index = (values.tolist() for values in (store.vehicle_offsets, store.first_day, store.day_index))
+            self.day_offsets = [np.array(store.day_offsets)]
+            self.rows = self.vehicle_offsets[-1]
+            del store
+        else:
+            os.makedirs(path, exist_ok=True)
+            self.vehicle_offsets, self.first_day, self.day_index, self.day_offsets = [0], [], [0], []
+            self.rows = 0
+            # an interrupted write must not leave a store that looks complete. Appends keep it, until the
+            # close the header and the indexes still describe the old rows only
+            if os.path.exists(os.path.join(path, META_FILE)):
+                os.remove(os.path.join(path, META_FILE))
+        self.file = open(os.path.join(path, TRIPS_FILE), mode='r+b' if append else 'wb')
+        if append:
+            # rows beyond the indexed ones are left over from an interrupted append
+            self.file.seek(HEADER_BYTES + self.rows * self.dtype.itemsize)
+            self.file.truncate()
+        else:
+            self.file.write(npy_header(self.dtype, 0))
+
+    def write_days(self, chunks, first_day=None, next_day=None):
+        """Writes chunks of consecutive days and their day offsets, returns the first and the next day"""
+        for trips in chunks:
+            if not len(trips):
+                continue
+            with PROFILER.stage('write'):
+                days = trips['day']
+                if first_day is None:
+                    first_day = next_day = int(days[0])
+                # every day gets an offset, days without rows (none in simulator output) get an empty range
+                new_days = np.arange(next_day, int(days[-1]) + 1)
+                self.day_offsets.append(self.rows + np.searchsorted(days, new_days))
+                next_day = int(days[-1]) + 1
+                self.file.write(np.ascontiguousarray(trips, dtype=self.dtype).tobytes())
+            self.rows += len(trips)
+            PROFILER.count('rows_written', len(trips))
+        return first_day, next_day
+
+    def end_vehicle(self, first_day, next_day):
+        self.day_offsets.append(np.array([self.rows]))
+        self.first_day.append(1 if first_day is None else first_day)
+        self.day_index.append(self.day_index[-1] + (0 if first_day is None else next_day - first_day) + 1)
+        self.vehicle_offsets.append(self.rows)
+        return len(self.first_day) - 1
+
+    def add_vehicle(self, chunks):
+        """Appends one vehicle given as trip_dtype() record arrays of consecutive days, returns its index"""
+        return self.end_vehicle(*self.write_days(chunks))
+
+    def extend_vehicle(self, chunks):
+        """Appends the trips of the days after the last one of the last vehicle"""
+        first_day = self.first_day.pop()
+        self.vehicle_offsets.pop()
+        num_days = self.day_index.pop() - self.day_index[-1] - 1
+        # the end row of the vehicle becomes the start of its next day
+        self.day_offsets[-1] = self.day_offsets[-1][:-1]
+        return self.end_vehicle(*self.write_days(chunks, first_day if num_days else None, first_day + num_days))
+
+    def truncate_vehicle(self, last_day):
+        """Drops the days after last_day of the last vehicle"""
+        start = self.day_index[-2]
+        num_days = self.day_index[-1] - start - 1
+        keep = min(max(last_day - self.first_day[-1] + 1, 0), num_days)
+        day_offsets = np.concatenate(self.day_offsets)[:start + keep + 1]
+        self.day_offsets = [day_offsets]
+        self.rows = int(day_offsets[-1])
+        self.day_index[-1] = start + keep + 1
+        self.vehicle_offsets[-1] = self.rows
+        self.file.seek(HEADER_BYTES + self.rows * self.dtype.itemsize)
+        self.file.truncate()
+
+    def last_day(self):
+        """Day number of the last day of the last vehicle"""
+        return self.first_day[-1] + self.day_index[-1] - self.day_index[-2] - 2
+
+    def close(self):
+        self.file.seek(0)
+        self.file.write(npy_header(self.dtype, self.rows))
+        self.file.close()
+        day_offsets = np.concatenate(self.day_offsets) if self.day_offsets else np.zeros(0)
+        for name, values in zip(INDEX_FILES, [self.vehicle_offsets, self.first_day, self.day_index, day_offsets]):
+            np.save(os.path.join(self.path, f"{name}.npy"), np.asarray(values, dtype=np.int64))
+        with open(os.path.join(self.path, META_FILE), mode='w') as file:
+            json.dump({'version': STORE_VERSION, 'vehicles': len(self.first_day), 'trips': self.rows}, file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.file.close()
+
+def write_store(path, vehicles):
+    """Writes a store with one vehicle per item of vehicles, each an iterable of trip_dtype() record arrays"""
+    with StoreWriter(path) as writer:
+        for chunks in vehicles:
+            writer.add_vehicle(chunks)
+
+class FleetStore:
+    """Read-only, memory-mapped view of a store, every accessor returns a slice of trips without copying"""
+    def __init__(self, path):
+        if not is_store(path):
+            raise ValueError(f"{path} is not a fleet store")
+        with open(os.path.join(path, META_FILE), mode='r') as file:
+            meta = json.load(file)
+        if meta.get('version') != STORE_VERSION:
+            raise ValueError(f"{path} is a fleet store of version {meta.get('version')}, expected {STORE_VERSION}")
+        self.path = path
+        self.trips = np.load(os.path.join(path, TRIPS_FILE), mmap_mode='r')
+        self.vehicle_offsets, self.first_day, self.day_index, self.day_offsets = (
+            np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r') for name in INDEX_FILES)
+
+    def __len__(self):
+        return len(self.first_day)
+
+    def num_days(self, first, last=None):
+        """Number of days of vehicles first to last (exclusive, default first + 1)"""
+        last = first + 1 if last is None else last
+        return int(self.day_index[last] - self.day_index[first]) - (last - first)
+
+    def vehicle(self, vehicle):
+        """All trips of one vehicle"""
+        return self.vehicles(vehicle, vehicle + 1)
+
+    def vehicles(self, first, last):
+        """All trips of vehicles first to last (exclusive)"""
+        return self.trips[self.vehicle_offsets[first]:self.vehicle_offsets[last]]
+
+    def days(self, vehicle, first, last=None):
+        """Trips of one vehicle from day first to day last (inclusive, default first), clipped to its horizon"""
+        last = first if last is None else last
+        start, num_days = self.first_day[vehicle], self.num_days(vehicle)
+        first, end = (min(max(day - start, 0), num_days) for day in (first, last + 1))
+        base = self.day_index[vehicle]
+        return self.trips[self.day_offsets[base + first]:self.day_offsets[base + max(end, first)]]
+
+    def iter_days(self, first, last=None):
+        """(vehicle, trips) of every vehicle for a day range"""
+        for vehicle in range(len(self)):
+            yield vehicle, self.days(vehicle, first, last)
+
+    def columns(self, vehicle):
+        """Column arrays (views) of one vehicle, as trace_io.read_trace returns them"""
+        return as_columns(self.vehicle(vehicle))
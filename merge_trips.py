@@ -1,13 +1,12 @@
+import argparse
 import csv
-
-def time_to_minutes(time_str):
-    """Converts a time string in HH:MM format to minutes since midnight."""
-    try:
-        hours, minutes = map(int, time_str.split(':'))
-        return hours * 60 + minutes
-    except ValueError:
-        # Return a large number to indicate invalid or missing time
-        return 24 * 60 
+import glob
+import hashlib
+import json
+import os
+import time
+from profiling import PROFILER, profiled
+from trace_io import COLUMNS, HEADER, as_records, columns_to_rows, read_trace, rows_to_columns, time_to_minutes, trace_format, write_columns
 
 def format_soc(soc_str):
     """Formats SOC string to one decimal precision, handling empty strings."""
@@ -64,33 +63,231 @@ def merge_trips(trips):
     return merged_trips
 
 
+def merge_columns(columns, group_sizes=False):
+    """Merges overlapping trips of a whole trace given as column arrays (see trace_io) without a Python loop per trip,
+    with group_sizes also returns the number of trips merged into every row"""
+    import numpy as np
+    has_trip = columns['dep_min'] >= 0
+    trips = {name: values[has_trip] for name, values in columns.items()}
+    order = np.lexsort((trips['dep_min'], trips['day']))
+    trips = {name: values[order] for name, values in trips.items()}
+
+    # Day and time combined into one increasing key, so the running maximum of the arrival key never
+    # reaches back into a previous day. A trip starts a new group if it departs after every earlier
+    # trip of its day has arrived.
+    minutes_per_day = 2 * 24 * 60
+    dep_key = trips['day'].astype(np.int64) * minutes_per_day + trips['dep_min']
+    arr_key = trips['day'].astype(np.int64) * minutes_per_day + np.maximum(trips['arr_min'], trips['dep_min'])
+    latest_arrival = np.maximum.accumulate(arr_key)
+    new_group = np.ones(len(dep_key), dtype=bool)
+    new_group[1:] = (trips['day'][1:] != trips['day'][:-1]) | (dep_key[1:] > latest_arrival[:-1])
+    starts = np.flatnonzero(new_group)
+
+    merged = {name: values[starts] for name, values in trips.items()}
+    if len(starts):
+        merged['arr_min'] = np.maximum.reduceat(trips['arr_min'], starts)
+        merged['soc_arr'] = np.minimum.reduceat(trips['soc_arr'], starts)
+        merged['distance'] = np.add.reduceat(np.nan_to_num(trips['distance']), starts).astype(COLUMNS['distance'])
+        merged['travel_time'] = np.add.reduceat(np.nan_to_num(trips['travel_time']), starts).astype(COLUMNS['travel_time'])
+        if 'floor_hit' in trips:
+            merged['floor_hit'] = np.logical_or.reduceat(trips['floor_hit'], starts)
+
+    # days without trips go back in between the merged trips
+    no_trips = {name: values[~has_trip] for name, values in columns.items()}
+    combined = {name: np.concatenate([merged[name], no_trips[name]]) for name in merged}
+    order = np.argsort(combined['day'], kind='stable')
+    combined = {name: values[order] for name, values in combined.items()}
+    if group_sizes:
+        sizes = np.r_[np.diff(np.r_[starts, len(dep_key)]), np.ones(len(no_trips['day']), dtype=np.int64)]
+        return combined, sizes[order]
+    return combined
+
+def merged_csv_rows(columns, sizes):
+    """CSV rows of merge_columns output, trips merged from several get the one-decimal SOC of merge_trips"""
+    for row, size in zip(columns_to_rows(columns), sizes.tolist()):
+        if size > 1:
+            row[3], row[5] = format_soc(row[3]), format_soc(row[5])
+        yield row
 
-def process_file(input_file, output_file):
-    with open(input_file, mode='r') as infile, open(output_file, mode='w', newline='') as outfile:
+def iter_rows(input_file):
+    """Yields the data rows of a CSV or columnar trace file, without the header"""
+    if trace_format(input_file) != 'csv':
+        yield from columns_to_rows(read_trace(input_file))
+        return
+    with open(input_file, mode='r') as infile:
         reader = csv.reader(infile)
+        next(reader)
+        yield from reader
+
+def departure_key(row):
+    return -1 if row[2] == "No trips" else time_to_minutes(row[2])
+
+def merge_rows(rows):
+    """Groups consecutive rows by day and yields the merged trips of every day, ordered by departure like
+    merge_columns, as simulator output is not sorted within a day"""
+    current_day = None
+    current_trips = []
+
+    for row in rows:
+        if len(row) < 6:
+            continue
+
+        day = int(row[0])
+        if day != current_day and current_trips:
+            yield from merge_trips(sorted(current_trips, key=departure_key))
+            current_trips = []
+
+        current_day = day
+        current_trips.append(row)
+
+    yield from merge_trips(sorted(current_trips, key=departure_key))
+
+def merge_store(input_file, output_file):
+    """Merges every vehicle of a fleet store into a new store, one vehicle in memory at a time"""
+    from fleet_store import FleetStore, write_store
+    if os.path.abspath(input_file) == os.path.abspath(output_file):
+        raise ValueError("A fleet store cannot be merged into itself")
+    store = FleetStore(input_file)
+
+    def merged(vehicle):
+        # the column views of the memory map are read from disk as merge_columns indexes them
+        columns = store.columns(vehicle)
+        with PROFILER.stage('merge'):
+            trips = as_records(merge_columns(columns))
+        PROFILER.count('rows_in', len(columns['day']))
+        PROFILER.count('rows_out', len(trips))
+        return [trips]
+    write_store(output_file, (merged(vehicle) for vehicle in range(len(store))))
+
+def process_file(input_file, output_file, vectorized=False):
+    """Merges overlapping trips of a CSV, npz, parquet or store trace, the output format follows the file extension.
+    Fleet stores are merged vehicle by vehicle into another store."""
+    if trace_format(input_file) == 'store' and trace_format(output_file) == 'store':
+        merge_store(input_file, output_file)
+        return
+    if vectorized:
+        with PROFILER.stage('read'):
+            columns = read_trace(input_file)
+        with PROFILER.stage('merge'):
+            merged, sizes = merge_columns(columns, group_sizes=True)
+        with PROFILER.stage('write'):
+            if trace_format(output_file) == 'csv':
+                with open(output_file, mode='w', newline='') as outfile:
+                    writer = csv.writer(outfile)
+                    writer.writerow(HEADER)
+                    writer.writerows(merged_csv_rows(merged, sizes))
+            else:
+                write_columns(output_file, merged)
+        PROFILER.count('rows_in', len(columns['day']))
+        PROFILER.count('rows_out', len(merged['day']))
+        return
+    rows = PROFILER.iterate('read', iter_rows(input_file), 'rows_in')
+    merged_rows = PROFILER.iterate('merge', merge_rows(rows), 'rows_out')
+    if trace_format(output_file) != 'csv':
+        columns = rows_to_columns(merged_rows)
+        with PROFILER.stage('write'):
+            write_columns(output_file, columns)
+        return
+    with open(output_file, mode='w', newline='') as outfile:
         writer = csv.writer(outfile)
-        headers = next(reader)
-        headers.extend(["Distance (km)", "Travel Time (min)"])  
-        writer.writerow(headers)
+        writer.writerow(HEADER)
+        with PROFILER.stage('write'):
+            writer.writerows(merged_rows)
 
-        current_day = None
-        current_trips = []
+MANIFEST = '.merge_manifest.json'
 
-        for row in reader:
-            if len(row) < 6:
-                continue
+def find_traces(pattern):
+    """Expands a glob pattern, or lists the trace files of a directory"""
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, 'ev_data_*')
+    return sorted(path for path in glob.glob(pattern) if path.endswith(('.csv', '.npz', '.parquet')))
+
+def file_hash(file_name):
+    digest = hashlib.sha256()
+    with open(file_name, mode='rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def is_up_to_date(input_file, output_file, skip, entry, vectorized, digest=None):
+    """Checks whether output_file was already merged from the current input_file in the same merge mode,
+    entry is the manifest record of the last merge and digest the hash of input_file for skip hash"""
+    if skip == 'none' or not os.path.exists(output_file):
+        return False
+    if entry is not None and entry.get('vectorized') != vectorized:
+        return False
+    if skip == 'hash':
+        return entry is not None and entry.get('hash') == digest
+    return os.path.getmtime(output_file) >= os.path.getmtime(input_file)
 
-            day = int(row[0])
-            if day != current_day and current_trips:
-                for merged_trip in merge_trips(current_trips):
-                    writer.writerow(merged_trip)
-                current_trips = []
+def merge_task(task):
+    input_file, output_file, vectorized, digest = task
+    start = time.perf_counter()
+    process_file(input_file, output_file, vectorized)
+    return input_file, digest, time.perf_counter() - start
 
-            current_day = day
-            current_trips.append(row)
+def write_manifest(file_name, manifest):
+    """Writes the manifest atomically, so an interrupted batch keeps the records of the files merged so far"""
+    tmp_name = f"{file_name}.tmp"
+    with open(tmp_name, mode='w') as file:
+        json.dump(manifest, file, indent=1)
+    os.replace(tmp_name, file_name)
 
-        for merged_trip in merge_trips(current_trips):
-            writer.writerow(merged_trip)
+def process_batch(pattern, output_dir, workers=None, vectorized=False, skip='mtime'):
+    """Merges every trace matching pattern into output_dir on a process pool, yields one report per file.
+    The manifest in output_dir records the hash and merge mode of every merged input as soon as it is done."""
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, mode='r') as file:
+            manifest = json.load(file)
 
-# replace this with the input and output file names
-process_file('ev_data_simple.csv', 'merged_ev_usage.csv')
+    tasks = []
+    for input_file in find_traces(pattern):
+        output_file = os.path.join(output_dir, os.path.basename(input_file))
+        # manifests of earlier versions only kept the hash
+        entry = manifest.get(os.path.basename(input_file))
+        entry = entry if isinstance(entry, dict) else None
+        digest = file_hash(input_file) if skip == 'hash' else None
+        if is_up_to_date(input_file, output_file, skip, entry, vectorized, digest):
+            yield {'file': input_file, 'skipped': True}
+        else:
+            tasks.append((input_file, output_file, vectorized, digest))
+
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for input_file, digest, seconds in executor.map(merge_task, tasks):
+            size_mb = os.path.getsize(input_file) / 1e6
+            manifest[os.path.basename(input_file)] = {'hash': digest, 'vectorized': vectorized}
+            write_manifest(manifest_path, manifest)
+            yield {'file': input_file, 'skipped': False, 'seconds': seconds, 'mb_per_s': size_mb / seconds if seconds > 0 else float('inf')}
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Merge overlapping trips of an EV usage trace.')
+    parser.add_argument('input', type=str, help='Trace produced by ev_simulation.py (csv, npz or parquet), a glob pattern or directory with --batch')
+    parser.add_argument('output', type=str, help='Merged output file, the format follows the extension, an output directory with --batch')
+    parser.add_argument('--vectorized', action='store_true', help='Load the whole trace into arrays and merge all days at once')
+    parser.add_argument('--batch', action='store_true', help='Merge every trace matching the input pattern into the output directory')
+    parser.add_argument('--workers', type=int, help='Number of worker processes for --batch, defaults to the number of CPUs')
+    parser.add_argument('--skip', type=str, default='mtime', choices=['mtime', 'hash', 'none'], help='How --batch detects outputs that are already up to date')
+    parser.add_argument('--profile', type=str, help='Write a JSON summary of the time spent per stage to this file (- for stderr), also enabled by SPAGHETTI_PROFILE')
+    parser.add_argument('--cprofile', type=str, help='Dump cProfile statistics (pstats) of the run to this file')
+    return parser
+
+
+if __name__ == '__main__':
+    parser = build_parser()
+    args = parser.parse_args()
+    if args.batch:
+        for report in process_batch(args.input, args.output, args.workers, args.vectorized, args.skip):
+            if report['skipped']:
+                print(f"{report['file']}: up to date")
+            else:
+                print(f"{report['file']}: {report['seconds']:.3f} s, {report['mb_per_s']:.2f} MB/s")
+    else:
+        try:
+            with profiled('merge_trips', args.profile, args.cprofile):
+                process_file(args.input, args.output, args.vectorized)
+        except ValueError as e:
+            print(f"Input Error: {e}")
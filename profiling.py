@@ -0,0 +1,112 @@
+# Opt-in timing of the pipeline stages. The simulators and merge_trips.py mark their stages (sampling, SOC,
+# formatting, writing, ...) on the shared PROFILER, which only measures anything inside profiled(), enabled by
+# --profile or the SPAGHETTI_PROFILE environment variable. Stage times are exclusive: a stage entered inside
+# another one pauses the outer stage, so streamed generators are charged to the stage that produces each item.
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+
+PROFILE_ENV = 'SPAGHETTI_PROFILE'
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.reset()
+
+    def reset(self):
+        self.seconds = {}
+        self.counts = {}
+        self.stack = []
+        self.mark = 0.0
+
+    def charge(self, name, now):
+        self.seconds[name] = self.seconds.get(name, 0.0) + now - self.mark
+        self.mark = now
+
+    def enter(self, name):
+        now = time.perf_counter()
+        if self.stack:
+            self.charge(self.stack[-1], now)
+        else:
+            self.mark = now
+        self.stack.append(name)
+
+    def exit(self):
+        self.charge(self.stack.pop(), time.perf_counter())
+
+    @contextmanager
+    def timed(self, name):
+        self.enter(name)
+        try:
+            yield
+        finally:
+            self.exit()
+
+    def stage(self, name):
+        """Context manager timing the enclosed block as stage name, a no-op when disabled"""
+        return self.timed(name) if self.enabled else nullcontext()
+
+    def count(self, name, n):
+        if self.enabled:
+            self.counts[name] = self.counts.get(name, 0) + n
+
+    def iterate(self, name, iterable, count=None):
+        """Charges the time spent producing each item of iterable to stage name, counts the items under count"""
+        if not self.enabled:
+            return iterable
+        return self.timed_items(name, iterable, count)
+
+    def timed_items(self, name, iterable, count):
+        iterator = iter(iterable)
+        while True:
+            self.enter(name)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.exit()
+            if count:
+                self.counts[count] = self.counts.get(count, 0) + 1
+            yield item
+
+    def summary(self, command, total_seconds):
+        stages = dict(sorted(self.seconds.items(), key=lambda item: -item[1]))
+        stages['other'] = max(total_seconds - sum(self.seconds.values()), 0.0)
+        return {'command': command, 'total_seconds': total_seconds, 'stages': stages, 'counts': self.counts}
+
+PROFILER = Profiler()
+
+@contextmanager
+def profiled(command, output=None, cprofile_output=None):
+    """Enables PROFILER around a command and writes its JSON summary to output ('-' for stderr), the
+    environment variable SPAGHETTI_PROFILE gives the default output. Also dumps pstats to cprofile_output."""
+    output = output or os.environ.get(PROFILE_ENV)
+    if not output and not cprofile_output:
+        yield
+        return
+    PROFILER.reset()
+    PROFILER.enabled = bool(output)
+    profile = None
+    if cprofile_output:
+        import cProfile
+        profile = cProfile.Profile()
+    start = time.perf_counter()
+    if profile:
+        profile.enable()
+    try:
+        yield
+    finally:
+        if profile:
+            profile.disable()
+            profile.dump_stats(cprofile_output)
+        PROFILER.enabled = False
+        if output:
+            summary = json.dumps(PROFILER.summary(command, time.perf_counter() - start), indent=1)
+            if output == '-':
+                print(summary, file=sys.stderr)
+            else:
+                with open(output, mode='w') as file:
+                    file.write(summary)
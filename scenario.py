@@ -0,0 +1,174 @@
+# Scenario files describing one vehicle or a whole fleet, in JSON, TOML or YAML (YAML needs PyYAML). A scenario
+# names the simulator variant, shared defaults and a list of vehicles; every vehicle may start from one of the
+# README presets, override any simulator argument, give its per-weekday non-commuting trips as a nested table
+# and be repeated count times. Without a vehicles list the file itself describes a single vehicle. The vehicles
+# are converted and validated in bulk, without an argparse run per vehicle, and simulated with fleet.py.
+#
+# Example (TOML):
+# variant = "extended"
+# seed = 42
+#
+# [defaults]
+# days = 365
+#
+# [[vehicles]]
+# preset = "T1"
+# count = 1000
+#
+# [[vehicles]]
+# preset = "T2"
+# C_dist = 40.0
+# weekdays = {sat = {nc = 2, dept = 10.0, arr = 12.0, dist = 15.0}}
+import argparse
+import json
+import os
+import numpy as np
+import ev_simulation_extended
+from ev_engine import input_table, validate_inputs
+from fleet import VARIANTS, iter_fleet_trips, write_fleet
+from trace_io import FORMATS
+
+# the WFH types of the README
+PRESETS = {
+    'T1': {'ev_battery': 60, 'max_soc': 0.8, 'min_soc': 0.2, 'consumption': 164, 'wfh_monday': 0, 'wfh_tuesday': 0, 'wfh_wednesday': 0,
+           'wfh_thursday': 0, 'wfh_friday': 0, 'C_dist': 62.8, 'C_dept': 8.0, 'C_arr': 18.0, 'N_nc': 3, 'N_hw': 6},
+    'T2': {'ev_battery': 60, 'max_soc': 0.8, 'min_soc': 0.2, 'consumption': 164, 'wfh_monday': 1, 'wfh_tuesday': 0, 'wfh_wednesday': 1,
+           'wfh_thursday': 0, 'wfh_friday': 1, 'C_dist': 62.8, 'C_dept': 8.0, 'C_arr': 18.0, 'N_nc': 3, 'N_hw': 6},
+    'T3': {'ev_battery': 60, 'max_soc': 0.8, 'min_soc': 0.2, 'consumption': 164, 'wfh_monday': 1, 'wfh_tuesday': 1, 'wfh_wednesday': 1,
+           'wfh_thursday': 1, 'wfh_friday': 1, 'C_dist': 0.0, 'C_dept': 8.0, 'C_arr': 18.0, 'N_nc': 3}
+}
+# keys of a scenario file that are not simulator arguments
+SCENARIO_KEYS = {'variant', 'seed', 'defaults', 'vehicles'}
+VEHICLE_KEYS = {'preset', 'count', 'weekdays'}
+
+def read_config(file_name):
+    """Reads a JSON, TOML or YAML file, the format follows the extension"""
+    extension = os.path.splitext(file_name)[1].lower()
+    if extension == '.toml':
+        try:
+            import tomllib
+        except ImportError:
+            raise ValueError("Reading TOML scenarios requires Python 3.11 or newer")
+        with open(file_name, mode='rb') as file:
+            return tomllib.load(file)
+    if extension in ('.yaml', '.yml'):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError("Reading YAML scenarios requires PyYAML to be installed")
+        with open(file_name, mode='r') as file:
+            return yaml.safe_load(file)
+    with open(file_name, mode='r') as file:
+        return json.load(file)
+
+def vehicle_overrides(spec):
+    """Flattens a preset, the arguments and the nested weekdays table of one vehicle entry into arguments"""
+    preset = spec.get('preset')
+    if preset is not None and preset not in PRESETS:
+        raise ValueError(f"Unknown preset {preset}, expected one of {', '.join(PRESETS)}")
+    overrides = {**PRESETS.get(preset, {}), **{key: value for key, value in spec.items() if key not in VEHICLE_KEYS}}
+    for day, trips in (spec.get('weekdays') or {}).items():
+        if day not in ev_simulation_extended.WEEKDAY_PREFIXES:
+            raise ValueError(f"Unknown weekday {day}, expected one of {', '.join(ev_simulation_extended.WEEKDAY_PREFIXES)}")
+        overrides.update({f"{day}_{name}": value for name, value in trips.items()})
+    return overrides
+
+def expand_vehicles(config):
+    """The argument overrides of every vehicle of a scenario, repeated vehicles included"""
+    if 'vehicles' in config:
+        specs = config['vehicles']
+    else:
+        specs = [{key: value for key, value in config.items() if key not in SCENARIO_KEYS}]
+    defaults = vehicle_overrides(config.get('defaults') or {})
+    vehicles = []
+    for spec in specs:
+        count = spec.get('count', 1)
+        if not isinstance(count, int) or count < 1:
+            raise ValueError("The count of a vehicle must be a positive integer")
+        vehicles.extend([{**defaults, **vehicle_overrides(spec)}] * count)
+    return vehicles
+
+def convert_column(name, values, arg_type):
+    """Converts the values of one argument for all vehicles at once, None stays None"""
+    if arg_type is bool:
+        return [value in (True, 1, '1', 'True', 'true') for value in values]
+    if arg_type not in (int, float):
+        return [None if value is None else arg_type(value) for value in values]
+    try:
+        numbers = np.array([np.nan if value is None else value for value in values], dtype=float)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number")
+    missing = np.isnan(numbers)
+    if arg_type is int:
+        fractional = np.flatnonzero(~missing & (numbers != np.floor(numbers)))
+        if len(fractional):
+            raise ValueError(f"{name} must be an integer (vehicle {fractional[0]})")
+        converted = np.where(missing, 0, numbers).astype(np.int64).tolist()
+    else:
+        converted = numbers.tolist()
+    if not missing.any():
+        return converted
+    return [None if is_missing else value for is_missing, value in zip(missing.tolist(), converted)]
+
+def load_scenario(config):
+    """Returns the variant, root seed and argparse Namespaces of all vehicles of a scenario file or dict"""
+    config = read_config(config) if isinstance(config, str) else config
+    variant = config.get('variant', 'simple')
+    if variant not in VARIANTS:
+        raise ValueError(f"Unknown simulator variant: {variant}")
+    vehicles = expand_vehicles(config)
+    if not vehicles:
+        raise ValueError("A scenario needs at least one vehicle")
+
+    parser = VARIANTS[variant].build_parser()
+    actions = {action.dest: action for action in parser._actions if action.dest != 'help'}
+    given = set().union(*vehicles)
+    unknown = given - set(actions)
+    if unknown:
+        raise ValueError(f"Unknown simulator arguments in scenario: {', '.join(sorted(unknown))}")
+    columns = {}
+    for name, action in actions.items():
+        arg_type = bool if isinstance(action.default, bool) else action.type or str
+        if name in given:
+            columns[name] = convert_column(name, [vehicle.get(name, action.default) for vehicle in vehicles], arg_type)
+        else:
+            # arguments no vehicle sets keep the CLI default, converted once
+            columns[name] = convert_column(name, [action.default], arg_type) * len(vehicles)
+        if action.choices is not None:
+            invalid = [i for i, value in enumerate(columns[name]) if value is not None and value not in action.choices]
+            if invalid:
+                raise ValueError(f"{name} must be one of {list(action.choices)} (vehicle {invalid[0]})")
+    rows = [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+    validate_inputs(input_table(rows))
+    if variant == 'extended':
+        ev_simulation_extended.validate_day_trips(rows)
+    namespaces = [argparse.Namespace() for _ in rows]
+    for namespace, row in zip(namespaces, rows):
+        vars(namespace).update(row)
+    return variant, config.get('seed'), namespaces
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Simulate the vehicles of a JSON, TOML or YAML scenario file.')
+    parser.add_argument('scenario', type=str, help='Scenario file with variant, seed, defaults and vehicles entries')
+    parser.add_argument('--output_dir', type=str, default='fleet', help='Directory receiving one output file per vehicle')
+    parser.add_argument('--format', type=str, default='csv', choices=FORMATS, help='Format of the output files, store writes one fleet store instead of a file per vehicle')
+    parser.add_argument('--seed', type=int, help='Root seed of the per-vehicle streams, overrides the seed of the scenario')
+    parser.add_argument('--workers', type=int, help='Number of worker processes, defaults to the number of CPUs')
+    parser.add_argument('--chunksize', type=int, default=64, help='Number of vehicles sent to a worker at once')
+    parser.add_argument('--check', action='store_true', help='Only load and validate the scenario')
+    return parser
+
+
+if __name__ == '__main__':
+    parser = build_parser()
+    args = parser.parse_args()
+    try:
+        variant, seed, vehicles = load_scenario(args.scenario)
+        if args.check:
+            print(f"{len(vehicles)} valid {variant} vehicles")
+        else:
+            seed = seed if args.seed is None else args.seed
+            write_fleet(iter_fleet_trips(vehicles, variant, seed, args.workers, args.chunksize), args.output_dir, args.format)
+    except ValueError as e:
+        print(f"Input Error: {e}")
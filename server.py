@@ -0,0 +1,94 @@
+# Long-lived simulation worker. Orchestrating many short runs through the CLIs pays the interpreter start-up and
+# the NumPy import every time, the server pays it once and then answers one JSON request per line, read from
+# stdin or from clients of a local (Unix or TCP) socket, with one JSON response per line.
+#
+# Requests name the simulator variant and give its arguments either as a dict or as a command line:
+# {"variant": "simple", "args": {"days": 365, "seed": 1, "output": "ev_data_1.csv"}}
+# {"variant": "extended", "argv": ["--days", "365", "--sat_nc", "2", "--sat_dept", "10", "--sat_arr", "12", "--sat_dist", "15"]}
+# Responses are {"ok": true, "output": ..., "seconds": ...} or {"ok": false, "error": ...}.
+import argparse
+import json
+import os
+import socketserver
+import sys
+import time
+from fleet import VARIANTS, vehicle_args
+
+def request_args(request):
+    """The argparse Namespace of a request"""
+    variant = request.get('variant', 'simple')
+    if variant not in VARIANTS:
+        raise ValueError(f"Unknown simulator variant: {variant}")
+    # argparse exits on invalid arguments, which must not end the server
+    if 'argv' in request:
+        try:
+            return variant, VARIANTS[variant].build_parser().parse_args([str(arg) for arg in request['argv']])
+        except SystemExit:
+            raise ValueError("Invalid command line, see the simulator's --help")
+    params = request.get('args', {})
+    if not isinstance(params, dict):
+        raise ValueError("The args of a request must be a JSON object")
+    try:
+        return variant, vehicle_args(variant, params)
+    except SystemExit:
+        raise ValueError("Invalid or unknown simulator arguments, see the simulator's --help")
+
+def handle_request(line):
+    """Runs the simulation of one JSON request line and returns the response dict"""
+    start = time.perf_counter()
+    try:
+        request = json.loads(line)
+        if not isinstance(request, dict):
+            raise ValueError("A request must be a JSON object")
+        variant, args = request_args(request)
+        VARIANTS[variant].main(args)
+    except (ValueError, OSError) as e:
+        return {'ok': False, 'error': str(e)}
+    except Exception as e:
+        # any other failure is reported to the client, the server keeps answering the next requests
+        return {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+    return {'ok': True, 'output': args.output, 'seconds': time.perf_counter() - start}
+
+def serve_lines(lines, write):
+    """Answers every non-empty request line, write receives the response lines"""
+    for line in lines:
+        if line.strip():
+            write(json.dumps(handle_request(line)) + '\n')
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        def write(response):
+            self.wfile.write(response.encode())
+            self.wfile.flush()
+        serve_lines((line.decode() for line in self.rfile), write)
+
+class UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+class TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Answer simulation requests (one JSON object per line) without restarting the interpreter.')
+    parser.add_argument('--socket', type=str, help='Listen on this Unix socket instead of reading stdin')
+    parser.add_argument('--port', type=int, help='Listen on this TCP port of localhost instead of reading stdin')
+    return parser
+
+
+if __name__ == '__main__':
+    parser = build_parser()
+    args = parser.parse_args()
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+        with UnixServer(args.socket, RequestHandler) as server:
+            server.serve_forever()
+    elif args.port:
+        with TCPServer(('127.0.0.1', args.port), RequestHandler) as server:
+            server.serve_forever()
+    else:
+        def write(response):
+            sys.stdout.write(response)
+            sys.stdout.flush()
+        serve_lines(sys.stdin, write)
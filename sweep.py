@@ -0,0 +1,148 @@
+# Parameter sweeps over the simulator arguments. A JSON spec lists a grid of values and/or ranges to sample
+# randomly; every point is simulated on a process pool and stored as a checkpoint part, so an interrupted
+# sweep resumes where it stopped. The parts are finally consolidated into one columnar .npz file holding
+# the parameters and summary statistics of every point together with all trips.
+#
+# Example spec:
+# {
+#     "variant": "simple",
+#     "base": {"days": 365, "N_hw": 6},
+#     "grid": {"ev_battery": [40, 60, 80], "wfh_monday": [0, 1]},
+#     "random": {"C_dist": [10, 80], "N_nc": [0, 10]},
+#     "samples": 20,
+#     "seed": 1
+# }
+import argparse
+import itertools
+import json
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from ev_random import make_rng, spawn_seeds
+from fleet import VARIANTS, simulate_vehicle_trips, vehicle_args
+from trace_io import COLUMNS, as_columns
+
+SUMMARY = ['trips', 'trip_free_days', 'distance_km', 'energy_kwh', 'min_soc']
+
+def load_spec(file_name):
+    with open(file_name, mode='r') as file:
+        spec = json.load(file)
+    if spec.get('variant', 'simple') not in VARIANTS:
+        raise ValueError(f"Unknown simulator variant: {spec['variant']}")
+    if not spec.get('grid') and not spec.get('random'):
+        raise ValueError("A sweep spec needs a grid or random section")
+    return spec
+
+def sweep_points(spec):
+    """Expands the spec into the list of parameter dicts, one per point"""
+    grid = spec.get('grid', {})
+    grid_points = [dict(zip(grid, values)) for values in itertools.product(*grid.values())]
+    random_ranges = spec.get('random', {})
+    if not random_ranges:
+        return [{**spec.get('base', {}), **point} for point in grid_points]
+    rng = make_rng(spec.get('seed'))
+    points = []
+    for _ in range(spec.get('samples', 1)):
+        sample = {}
+        for name, (low, high) in random_ranges.items():
+            if isinstance(low, int) and isinstance(high, int):
+                sample[name] = int(rng.integers(low, high, endpoint=True))
+            else:
+                sample[name] = float(rng.uniform(low, high))
+        points.extend({**spec.get('base', {}), **point, **sample} for point in grid_points)
+    return points
+
+def summarize_trips(columns):
+    """Summary statistics of one point, the energy is the SOC drawn from the battery over all trips"""
+    has_trip = columns['dep_min'] >= 0
+    soc_arr = columns['soc_arr'][has_trip]
+    return {
+        'trips': int(has_trip.sum()),
+        'trip_free_days': int((~has_trip).sum()),
+        'distance_km': float(np.nansum(columns['distance'][has_trip])),
+        'energy_kwh': float(np.sum(columns['soc_dep'][has_trip] - soc_arr)),
+        'min_soc': float(soc_arr.min()) if len(soc_arr) else float('nan')
+    }
+
+def part_path(parts_dir, index):
+    return os.path.join(parts_dir, f"point_{index}.npz")
+
+def run_point(task):
+    """Simulates one point and stores its trips and summary as a checkpoint part"""
+    variant, params, seed, path = task
+    columns = as_columns(simulate_vehicle_trips((variant, params, seed)))
+    summary = summarize_trips(columns)
+    tmp_path = f"{path[:-4]}.tmp.npz"
+    np.savez(tmp_path, **columns, **{f"summary_{name}": value for name, value in summary.items()})
+    os.replace(tmp_path, path)
+    return path
+
+def consolidate(output, points, parts_dir):
+    """Merges the checkpoint parts into one columnar file with a point column on the trips"""
+    trips = {name: [] for name in COLUMNS}
+    trips['point'] = []
+    summaries = {name: [] for name in SUMMARY}
+    for index in range(len(points)):
+        with np.load(part_path(parts_dir, index)) as part:
+            for name in COLUMNS:
+                trips[name].append(part[name])
+            trips['point'].append(np.full(len(part['day']), index, dtype=np.int32))
+            for name in SUMMARY:
+                summaries[name].append(part[f"summary_{name}"])
+    params = {}
+    for name in sorted({name for point in points for name in point}):
+        values = [point.get(name) for point in points]
+        if all(isinstance(value, (int, float)) or value is None for value in values):
+            params[f"param_{name}"] = np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+        else:
+            params[f"param_{name}"] = np.array(["" if value is None else str(value) for value in values])
+    np.savez(output, **{name: np.concatenate(values) for name, values in trips.items()},
+             **{f"summary_{name}": np.array(values) for name, values in summaries.items()}, **params)
+
+def run_sweep(spec, output, workers=None):
+    """Runs every point of the spec that has no checkpoint part yet, then consolidates them, yields progress"""
+    variant = spec.get('variant', 'simple')
+    parts_dir = output + '.parts'
+    state_path = os.path.join(parts_dir, 'state.json')
+    # the expanded points and root seed are checkpointed too, so unseeded random sweeps resume the same points
+    if os.path.exists(state_path):
+        with open(state_path, mode='r') as file:
+            state = json.load(file)
+        if state['spec'] != spec:
+            raise ValueError(f"{parts_dir} belongs to a different sweep spec")
+    else:
+        state = {'spec': spec, 'points': sweep_points(spec), 'entropy': np.random.SeedSequence(spec.get('seed')).entropy}
+        for params in state['points']:
+            vehicle_args(variant, params)  # fails fast on unknown or malformed parameters
+        os.makedirs(parts_dir, exist_ok=True)
+        with open(state_path, mode='w') as file:
+            json.dump(state, file, indent=1)
+    points = state['points']
+
+    seeds = spawn_seeds(state['entropy'], len(points))
+    tasks = [(variant, params, seed, part_path(parts_dir, index)) for index, (params, seed) in enumerate(zip(points, seeds))
+             if not os.path.exists(part_path(parts_dir, index))]
+    done = len(points) - len(tasks)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for future in as_completed([executor.submit(run_point, task) for task in tasks]):
+            future.result()
+            done += 1
+            yield done, len(points)
+    consolidate(output, points, parts_dir)
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Sweep the EV usage simulator over a grid or random sample of its arguments.')
+    parser.add_argument('spec', type=str, help='JSON sweep spec with variant, base, grid, random, samples and seed entries')
+    parser.add_argument('--output', type=str, default='sweep.npz', help='Consolidated output file, checkpoints are kept next to it in <output>.parts')
+    parser.add_argument('--workers', type=int, help='Number of worker processes, defaults to the number of CPUs')
+    return parser
+
+
+if __name__ == '__main__':
+    parser = build_parser()
+    args = parser.parse_args()
+    try:
+        for done, total in run_sweep(load_spec(args.spec), args.output, args.workers):
+            print(f"{done}/{total} points")
+    except ValueError as e:
+        print(f"Input Error: {e}")
@@ -0,0 +1,40 @@
+# this test file tests the trace analytics
+import unittest
+import os
+import tempfile
+from analytics import summarize, summarize_file
+from trace_io import read_trace, write_columns
+
+class TestAnalytics(unittest.TestCase):
+    def test_merged_trace_counts(self):
+        report = summarize_file('merged_ev_T3.csv').report()
+        with open('merged_ev_T3.csv') as file:
+            lines = file.readlines()[1:]
+        no_trips = sum(1 for line in lines if "No trips" in line)
+        self.assertEqual(report['trip_free_days'], no_trips)
+        self.assertEqual(report['trips'], len(lines) - no_trips)
+        self.assertAlmostEqual(report['co2_kg'], report['total_distance_km'] * 166.85 / 1000)
+
+    def test_columnar_matches_csv(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'trace.npz')
+            write_columns(path, read_trace('ev_data_T1.csv'))
+            from_csv = summarize_file('ev_data_T1.csv').report()
+            from_npz = summarize_file(path).report()
+        for key in ['days', 'trips', 'trip_free_days']:
+            self.assertEqual(from_csv[key], from_npz[key])
+        self.assertAlmostEqual(from_csv['total_distance_km'], from_npz['total_distance_km'], places=1)
+        self.assertEqual(list(from_csv['per_week_distance_km']), list(from_npz['per_week_distance_km']))
+
+    def test_fleet_and_factors(self):
+        paths = ['ev_data_T1.csv', 'ev_data_T2.csv', 'ev_data_T3.csv']
+        fleet = summarize(paths, workers=2).report({'petrol_price_per_l': 2.0})
+        single = [summarize_file(path).report() for path in paths]
+        self.assertEqual(fleet['files'], 3)
+        self.assertEqual(fleet['trips'], sum(report['trips'] for report in single))
+        self.assertAlmostEqual(fleet['petrol_cost'], fleet['total_distance_km'] / 15.3052 * 2.0)
+        self.assertEqual(sum(day['trips'] for day in fleet['per_weekday'].values()), fleet['trips'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,23 @@
+# this test file tests the benchmark suite
+import unittest
+from benchmark import benchmark_plan, compare, run_case
+
+class TestBenchmark(unittest.TestCase):
+    def test_plan_covers_both_variants_and_fleets(self):
+        plan = benchmark_plan(years=[1, 10], fleet_sizes=[1, 10])
+        self.assertIn(('generate', 'extended', 10, 1), plan)
+        self.assertIn(('fleet', 'simple', 1, 10), plan)
+        self.assertEqual(len([entry for entry in plan if entry[0] == 'merge']), 2)
+
+    def test_case_result(self):
+        result = run_case('merge_vectorized', years=1)
+        self.assertEqual(result['days'], 365)
+        self.assertGreater(result['trips'], 0)
+        self.assertAlmostEqual(result['days_per_s'] * result['seconds'], 365)
+        self.assertGreater(result['peak_rss_mb'], 0)
+        changes = compare([result], {'results': [{**result, 'days_per_s': result['days_per_s'] / 2}]})
+        self.assertAlmostEqual(list(changes.values())[0], 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+# this test file tests the charging-load profiles
+import unittest
+import numpy as np
+from charging import charging_profile, fleet_profile
+from trace_io import read_trace, rows_to_columns
+
+class TestCharging(unittest.TestCase):
+    def test_energy_and_availability(self):
+        columns = rows_to_columns([
+            [1, 'Monday', '08:00', '32.00', '17:00', '28.00', '20.00', 540],
+            [1, 'Monday', '18:00', '28.00', '19:00', '25.00', '15.00', 12],
+            [2, 'Tuesday', 'No trips', '32.00', '', '32.00'],
+        ])
+        profile = charging_profile(columns, charger_kw=3.5, resolution=15)
+        self.assertEqual(len(profile['charging_kw']), 2 * 96)
+        # 7 kWh at 3.5 kW take two hours from the 19:00 arrival
+        self.assertAlmostEqual(profile['charging_kw'].sum() * 0.25, 7.0, places=5)
+        self.assertEqual(profile['charging_kw'][19 * 4:21 * 4].tolist(), [3.5] * 8)
+        self.assertEqual(profile['charging_kw'][21 * 4], 0)
+        self.assertEqual(profile['plugged_in'][8 * 4:17 * 4].sum(), 0)
+        self.assertEqual(profile['plugged_in'][96:].tolist(), [1.0] * 96)
+
+    def test_fleet_is_sum_of_vehicles(self):
+        paths = ['ev_data_T1.csv', 'ev_data_T2.csv']
+        fleet = fleet_profile(paths, resolution=60, workers=2)
+        single = [charging_profile(read_trace(path), resolution=60) for path in paths]
+        length = min(len(profile['charging_kw']) for profile in single)
+        np.testing.assert_allclose(fleet['charging_kw'][:length], sum(profile['charging_kw'][:length] for profile in single))
+        self.assertTrue((fleet['plugged_in'] <= 2).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
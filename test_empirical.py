@@ -0,0 +1,60 @@
+# this test file tests the empirical non-commuting trip model
+import unittest
+import os
+import tempfile
+import numpy as np
+import ev_simulation
+import ev_simulation_extended
+from empirical import fit_traces, load_model
+from ev_cache import cache_key
+from fleet import vehicle_args
+from trace_io import read_trace
+
+def non_commute(columns, commute_hours=4):
+    duration = (columns['arr_min'].astype(int) - columns['dep_min']) % 1440
+    return (columns['dep_min'] >= 0) & (duration < commute_hours * 60)
+
+class TestEmpiricalModel(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.model_file = os.path.join(self.tmpdir.name, 'model.npz')
+        fit_traces(['ev_data_T1.csv']).save(self.model_file)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_generated_trips_follow_reference(self):
+        reference = read_trace('ev_data_T1.csv')
+        args = vehicle_args('simple', {'days': 3650, 'seed': 3, 'no_cache': True, 'empirical': self.model_file,
+                                       'C_dept': 8.0, 'C_arr': 18.0, 'C_dist': 62.8})
+        trips = ev_simulation.simulate_trips(args)
+        trips = trips[non_commute(trips)]
+        is_trip = non_commute(reference)
+        self.assertAlmostEqual(len(trips) / 3650, is_trip.sum() / 365, delta=0.05)
+        self.assertAlmostEqual(trips['distance'].mean(), reference['distance'][is_trip].mean(), delta=1.0)
+        # departures only fall in hours that have reference departures
+        reference_hours = set((reference['dep_min'][is_trip] // 60).tolist())
+        self.assertTrue(set((trips['dep_min'] // 60).tolist()) <= reference_hours)
+
+    def test_fixed_weekdays_keep_fixed_trips(self):
+        args = vehicle_args('extended', {'days': 70, 'seed': 1, 'no_cache': True, 'empirical': self.model_file,
+                                         'sat_nc': 2, 'sat_dept': 10.0, 'sat_arr': 12.0, 'sat_dist': 15.0})
+        trips = ev_simulation_extended.simulate_trips(args)
+        saturday = trips[(trips['weekday'] == 5) & (trips['dep_min'] >= 0)]
+        self.assertEqual(len(saturday), 20)
+        self.assertTrue((saturday['distance'] == 15.0).all())
+
+    def test_model_round_trip_and_cache_key(self):
+        model = load_model(self.model_file)
+        np.testing.assert_array_equal(model.count_cdf[:, -1], 1.0)
+        self.assertEqual(model.days_fitted.sum(), 365)
+        args = vehicle_args('simple', {'seed': 1, 'empirical': self.model_file})
+        key = cache_key('simple', args)
+        fit_traces(['ev_data_T2.csv']).save(self.model_file)
+        self.assertNotEqual(cache_key('simple', args), key)
+        with self.assertRaises(ValueError):
+            load_model(os.path.join(self.tmpdir.name, 'missing.npz'))
+
+
+if __name__ == '__main__':
+    unittest.main()
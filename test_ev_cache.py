@@ -0,0 +1,68 @@
+# this test file tests the result cache
+import unittest
+import filecmp
+import os
+import shutil
+import tempfile
+import ev_simulation
+import ev_simulation_extended
+from ev_cache import SOURCE_MODULES, source_version
+from fleet import vehicle_args
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmpdir.name, 'cache')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def args(self, variant, **params):
+        args = vehicle_args(variant, {'days': 60, 'seed': 5, 'N_nc': 10, 'cache_dir': self.cache_dir, **params})
+        args.output = os.path.join(self.tmpdir.name, f"{variant}_{len(os.listdir(self.tmpdir.name))}.csv")
+        return args
+
+    def test_cached_output_is_identical(self):
+        for variant, module in [('simple', ev_simulation), ('extended', ev_simulation_extended)]:
+            fresh = self.args(variant)
+            module.main(fresh)
+            self.assertEqual(len(os.listdir(self.cache_dir)), 1 if variant == 'simple' else 2)
+            cached = self.args(variant)
+            module.main(cached)
+            uncached = self.args(variant, no_cache=True)
+            module.main(uncached)
+            self.assertTrue(filecmp.cmp(fresh.output, cached.output, shallow=False))
+            self.assertTrue(filecmp.cmp(fresh.output, uncached.output, shallow=False))
+            self.assertEqual(module.run_simulation(self.args(variant)), module.run_simulation(self.args(variant, no_cache=True)))
+
+    def test_key_includes_seed_and_parameters(self):
+        ev_simulation.run_simulation(self.args('simple'))
+        ev_simulation.run_simulation(self.args('simple', seed=6))
+        ev_simulation.run_simulation(self.args('simple', C_dist=30.0))
+        ev_simulation.run_simulation(self.args('simple', no_cache=True, seed=7))
+        self.assertEqual(len(os.listdir(self.cache_dir)), 3)
+
+    def test_key_follows_generator_sources(self):
+        sources = os.path.join(self.tmpdir.name, 'sources')
+        os.makedirs(sources)
+        for module in SOURCE_MODULES:
+            shutil.copy(f"{module}.py", sources)
+        self.assertEqual(source_version(sources), source_version())
+        with open(os.path.join(sources, 'ev_soc.py'), mode='a') as file:
+            file.write('\n')
+        self.assertNotEqual(source_version.__wrapped__(sources), source_version())
+
+    def test_unseeded_runs_are_not_cached(self):
+        args = self.args('simple')
+        args.seed = None
+        ev_simulation.run_simulation(args)
+        self.assertFalse(os.path.exists(self.cache_dir))
+
+    def test_size_limit_evicts_oldest(self):
+        for seed in range(5):
+            ev_simulation.run_simulation(self.args('simple', seed=seed, cache_size=0.01))
+        self.assertLess(len(os.listdir(self.cache_dir)), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,13 @@
 # this test file tests the generator
 import unittest
-from ev_simulation import main, ElectricVehicle, generate_trip_data , run_simulation
+from ev_simulation import main, ElectricVehicle, generate_trip_data , generate_trips, iter_trip_data, trips_to_trip_data, run_simulation, sample_commute_times, sample_commute_times_batch, sample_non_commute_times_batch
+import ev_simulation_extended
+from ev_engine import DayTrips
+from ev_soc import floor_balance
+from trace_io import trip_dtype
+import types
+import numpy as np
+from ev_calendar import build_calendar
 import tempfile
 import os
 import argparse
@@ -23,7 +30,8 @@ class TestEVGenerator(unittest.TestCase):
             C_dist=20.0,
             C_dept=7.45,
             C_arr=17.30,
-            N_nc=5
+            N_nc=5,
+            N_hw=6
         )
     
     def test_input_format(self):
@@ -74,5 +82,173 @@ class TestEVGenerator(unittest.TestCase):
         if os.path.exists(self.args.output):
             os.remove(self.args.output)
 
+class TestEngine(unittest.TestCase):
+    def setUp(self):
+        self.args = argparse.Namespace(
+            days=3650,
+            ev_battery=40,
+            max_soc=0.8,
+            min_soc=0.2,
+            consumption=164,
+            wfh_monday=0,
+            wfh_tuesday=1,
+            wfh_wednesday=0,
+            wfh_thursday=1,
+            wfh_friday=0,
+            C_dist=20.0,
+            C_dept=7.45,
+            C_arr=17.30,
+            N_nc=5,
+            N_hw=6
+        )
+        self.ev = ElectricVehicle(self.args.ev_battery, self.args.max_soc, self.args.min_soc, self.args.consumption)
+
+    def test_expected_number_of_trips(self):
+        # 3 commute days per week outside the 6 holiday weeks of each year, plus N_nc non-commuting trips per week
+        trips = [trip for _, trips in generate_trip_data(self.args, self.ev) for trip in trips if trip[1] != "No trips"]
+        expected = self.args.days / 7 * (3 * 46 / 52 + self.args.N_nc)
+        self.assertAlmostEqual(len(trips) / expected, 1, delta=0.05)
+
+    def test_extended_shares_schema(self):
+        day_trips = [None, None, None, None, None, DayTrips(2, 10.0, 12.0, 15.0), None]
+        simple_data = generate_trip_data(self.args, self.ev)
+        extended_data = ev_simulation_extended.generate_trip_data(self.args, self.ev, day_trips)
+        self.assertEqual({len(trip) for _, trips in simple_data for trip in trips}, {len(trip) for _, trips in extended_data for trip in trips})
+        saturday_trips = extended_data[5][1]
+        self.assertEqual([trip[1] for trip in saturday_trips], ["10:00", "10:00"])
+        self.assertEqual([trip[5] for trip in saturday_trips], ["15.00", "15.00"])
+
+    def test_streaming_in_chunks(self):
+        trip_data = iter_trip_data(self.args, self.ev, chunk_days=100)
+        self.assertIsInstance(trip_data, types.GeneratorType)
+        self.assertEqual([day for day, _ in trip_data], list(range(1, self.args.days + 1)))
+
+    def test_merge_mode(self):
+        self.args.N_nc = 20
+        self.args.merge = True
+        for _, trips in generate_trip_data(self.args, self.ev):
+            for previous, trip in zip(trips, trips[1:]):
+                self.assertGreater(trip[1], previous[3])
+
+    def test_seeded_runs_reproducible(self):
+        self.args.seed = 42
+        self.assertEqual(generate_trip_data(self.args, self.ev), generate_trip_data(self.args, self.ev))
+        self.args.seed = 43
+        self.assertNotEqual(generate_trip_data(self.args, self.ev)[:30], generate_trip_data(argparse.Namespace(**{**vars(self.args), 'seed': 42}), self.ev)[:30])
+
+    def test_batched_samplers(self):
+        rng = np.random.default_rng(1)
+        self.args.C_arr = self.args.C_dept + 0.3
+        t_dep, t_arr = sample_commute_times_batch(self.args, rng, 20000)
+        self.assertTrue((t_arr > t_dep).all())
+        scalar_arr = [sample_commute_times(self.args, rng)[1] for _ in range(20000)]
+        self.assertAlmostEqual(t_arr.mean(), np.mean(scalar_arr), delta=0.01)
+        t_dep, t_arr = sample_non_commute_times_batch(self.args, rng, 1000)
+        self.assertTrue(((t_arr - t_dep) % 24 >= 1).all() and ((t_arr - t_dep) % 24 <= 2).all())
+
+    def test_trip_records(self):
+        self.args.seed = 3
+        trips = generate_trips(self.args, self.ev)
+        self.assertEqual(trips.dtype, trip_dtype())
+        self.assertTrue((np.diff(trips['day']) >= 0).all())
+        self.assertEqual(trips_to_trip_data(trips), generate_trip_data(self.args, self.ev))
+        no_trips = trips[trips['dep_min'] < 0]
+        self.assertTrue(np.isnan(no_trips['distance']).all())
+
+    def test_soc_clipped_at_min_soc(self):
+        self.args.C_dist = 400.0
+        for _, trips in generate_trip_data(self.args, self.ev):
+            for trip in trips:
+                self.assertGreaterEqual(float(trip[4]), self.ev.min_soc * self.ev.battery_size)
+                self.assertLessEqual(float(trip[2]), self.ev.max_soc * self.ev.battery_size)
+
+    def assert_floor_balance_matches_loop(self, charge, use):
+        soc, hit = floor_balance(charge, use, 32.0, 8.0, 32.0)
+        expected, expected_hit, level = [], [], 32.0
+        for c, u in zip(charge, use):
+            level = min(level + c, 32.0) - u
+            expected_hit.append(level < 8.0)
+            level = max(level, 8.0)
+            expected.append(level)
+        np.testing.assert_allclose(soc, expected, atol=1e-9)
+        self.assertEqual(hit.tolist(), expected_hit)
+
+    def test_floor_balance_matches_loop(self):
+        rng = np.random.default_rng(7)
+        charge, use = rng.uniform(0, 6, 5000) * (rng.random(5000) < 0.3), rng.uniform(0, 4, 5000)
+        self.assert_floor_balance_matches_loop(charge, use)
+
+    def test_floor_balance_long_floored_trajectory(self):
+        # weak charging keeps the battery at the floor for most of a long horizon
+        rng = np.random.default_rng(8)
+        charge, use = rng.uniform(0, 2, 60000) * (rng.random(60000) < 0.2), rng.uniform(0, 4, 60000)
+        self.assert_floor_balance_matches_loop(charge, use)
+        self.assert_floor_balance_matches_loop(np.zeros(60000), use)
+
+    def test_carry_soc(self):
+        self.args.days = 60
+        self.args.seed = 2
+        self.args.carry_soc = True
+        self.args.home_charger_kw = 0.0
+        self.args.work_charger_kw = 0.0
+        trips = generate_trips(self.args, self.ev)
+        with_trip = trips[trips['dep_min'] >= 0]
+        # without any charging the SOC only goes down, until the trips run into min SOC
+        self.assertTrue((np.diff(trips['soc_arr']) <= 1e-5).all())
+        self.assertTrue(with_trip['floor_hit'].any())
+        self.assertTrue(np.allclose(with_trip['soc_arr'][with_trip['floor_hit']], 8.0))
+        self.args.home_charger_kw = 100.0
+        trips = generate_trips(self.args, self.ev)
+        first_of_day = np.r_[True, trips['day'][1:] != trips['day'][:-1]]
+        self.assertTrue(np.allclose(trips['soc_dep'][first_of_day], 32.0))
+        self.assertFalse(trips['floor_hit'].any())
+
+        # a workplace charger tops the battery up during the commute days
+        self.args.home_charger_kw = 0.0
+        self.args.C_dist = 60.0
+        without = generate_trips(self.args, self.ev)
+        self.args.work_charger_kw = 11.0
+        with_work = generate_trips(self.args, self.ev)
+        np.testing.assert_array_equal(with_work['dep_min'], without['dep_min'])
+        commute = with_work['travel_time'] == round((self.args.C_arr - self.args.C_dept) * 60)
+        self.assertTrue(commute.any())
+        self.assertTrue((with_work['soc_arr'] >= without['soc_arr'] - 1e-5).all())
+        self.assertTrue((with_work['soc_arr'][commute] > without['soc_arr'][commute] + 1.0).any())
+        self.assertLess(with_work['floor_hit'].sum(), without['floor_hit'].sum())
+
+
+class TestCalendar(unittest.TestCase):
+    def setUp(self):
+        self.args = argparse.Namespace(days=3 * 364, wfh_monday=1, wfh_tuesday=0, wfh_wednesday=0, wfh_thursday=0, wfh_friday=0, N_hw=4)
+
+    def test_holiday_weeks_every_year(self):
+        weekday, is_commute_day, holiday_plan = build_calendar(self.args, np.random.default_rng(0))
+        self.assertEqual(holiday_plan.shape, (3, 4))
+        self.assertFalse(is_commute_day[weekday >= 5].any())
+        self.assertFalse(is_commute_day[weekday == 0].any())
+        # 3 years of 52 weeks with 3 commute days per week, minus the holiday weeks
+        self.assertEqual(int(is_commute_day.sum()), 3 * (52 - 4) * 4)
+
+    def test_start_date_and_public_holidays(self):
+        self.args.N_hw = 0
+        self.args.start_date = '2025-12-24'
+        self.args.public_holidays = '2025-12-25,2026-01-01'
+        weekday, is_commute_day, _ = build_calendar(self.args, np.random.default_rng(0))
+        # 24 December 2025 is a Wednesday
+        self.assertEqual(weekday[:3].tolist(), [2, 3, 4])
+        self.assertEqual(is_commute_day[:3].tolist(), [True, False, True])
+        self.assertFalse(is_commute_day[8])
+
+    def test_simulators_follow_mask(self):
+        self.args.start_date = '2025-12-24'
+        self.args.days = 60
+        self.args.public_holidays = '2025-12-25'
+        full_args = argparse.Namespace(**vars(self.args), ev_battery=40, max_soc=0.8, min_soc=0.2, consumption=164, C_dist=20.0, C_dept=7.45, C_arr=17.30, N_nc=0)
+        ev = ElectricVehicle(40, 0.8, 0.2, 164)
+        trip_data = generate_trip_data(full_args, ev)
+        self.assertEqual(trip_data[0][1][0][0], "Wednesday")
+        self.assertEqual(trip_data[1][1][0][1], "No trips")
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,87 @@
+# this test file tests the incremental extension of traces
+import unittest
+import os
+import tempfile
+import numpy as np
+import ev_simulation
+from ev_engine import ElectricVehicle, iter_trips
+from ev_state import TraceState, read_state, state_path, trace_params
+from fleet import vehicle_args
+from trace_io import read_trace
+
+class TestTraceExtension(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_extension_continues_stream_and_soc(self):
+        # without holiday weeks the calendar draws nothing, so extending a trace at a chunk boundary
+        # continues exactly as a single run drawing the same chunks
+        args = vehicle_args('simple', {'days': 730, 'seed': 3, 'N_hw': 0, 'carry_soc': True, 'home_charger_kw': 2.0})
+        ev = ElectricVehicle(args.ev_battery, args.max_soc, args.min_soc, args.consumption)
+        whole = np.concatenate(list(iter_trips(args, ev, chunk_days=365)))
+        state = TraceState('simple', trace_params(args))
+        args.days = 365
+        first = list(iter_trips(args, ev, state=state))
+        self.assertEqual(state.days, 365)
+        args.days = 730
+        second = list(iter_trips(args, ev, state=state))
+        self.assertEqual(np.concatenate(first + second).tobytes(), whole.tobytes())
+
+    def test_extend_output_files(self):
+        for fmt in ['csv', 'store']:
+            output = os.path.join(self.tmpdir.name, f"ev_data.{fmt}")
+            args = vehicle_args('simple', {'days': 100, 'seed': 1, 'extend': True, 'merge': True, 'format': fmt, 'output': output})
+            ev_simulation.main(args)
+            first = read_trace(output)
+            args.days = 250
+            ev_simulation.main(args)
+            ev_simulation.main(args)
+            trace = read_trace(output)
+            rows = len(first['day'])
+            for name, values in first.items():
+                np.testing.assert_array_equal(trace[name][:rows], values)
+            self.assertEqual(np.unique(trace['day']).tolist(), list(range(1, 251)))
+            self.assertEqual(read_state(state_path(output)).days, 250)
+
+            args.days = 200
+            with self.assertRaises(ValueError):
+                ev_simulation.main(args)
+            args.days, args.N_nc = 300, 5
+            with self.assertRaises(ValueError):
+                ev_simulation.main(args)
+
+    def test_extend_drops_interrupted_append(self):
+        for fmt in ['csv', 'store']:
+            clean, output = (os.path.join(self.tmpdir.name, f"{name}.{fmt}") for name in ['clean', 'ev_data'])
+            for path in [clean, output]:
+                args = vehicle_args('simple', {'days': 100, 'seed': 2, 'extend': True, 'carry_soc': True, 'format': fmt, 'output': path})
+                ev_simulation.main(args)
+            # an interrupted run wrote further rows, but never saved the state
+            if fmt == 'csv':
+                with open(output, mode='a') as file:
+                    file.write('101,Sat,480,7')
+            else:
+                with open(os.path.join(output, 'trips.npy'), mode='ab') as file:
+                    file.write(b'\0' * 100)
+            for path in [clean, output]:
+                args.days, args.output = 150, path
+                ev_simulation.main(args)
+            for name, values in read_trace(clean).items():
+                np.testing.assert_array_equal(read_trace(output)[name], values)
+
+            # a trace missing days of its state cannot be continued
+            if fmt == 'csv':
+                with open(output, mode='r') as file:
+                    lines = file.readlines()
+                with open(output, mode='w') as file:
+                    file.writelines(line for line in lines if not line.startswith('150,'))
+                args.days = 200
+                with self.assertRaises(ValueError):
+                    ev_simulation.main(args)
+
+
+if __name__ == '__main__':
+    unittest.main()
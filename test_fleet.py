@@ -0,0 +1,37 @@
+# this test file tests the fleet simulation
+import unittest
+from fleet import run_fleet, vehicle_args
+
+class TestFleet(unittest.TestCase):
+    def setUp(self):
+        self.vehicles = [
+            {'days': 28, 'ev_battery': 60, 'C_dist': 62.8, 'N_hw': 0},
+            {'days': 28, 'wfh_monday': 1, 'wfh_friday': 1, 'N_nc': 5},
+            {'days': 28, 'C_dist': 0.0, 'merge': 1}
+        ]
+
+    def test_vehicle_args_use_cli_defaults(self):
+        args = vehicle_args('simple', {'ev_battery': '60', 'wfh_monday': '1'})
+        self.assertEqual(args.ev_battery, 60.0)
+        self.assertEqual(args.wfh_monday, 1)
+        self.assertEqual(args.consumption, 164)
+
+    def test_one_trace_per_vehicle(self):
+        results = list(run_fleet(self.vehicles, seed=1, workers=2))
+        self.assertEqual([index for index, _ in results], [0, 1, 2])
+        for _, trip_data in results:
+            self.assertEqual(len(trip_data), 28)
+
+    def test_reproducible_with_seed(self):
+        first = list(run_fleet(self.vehicles, seed=7, workers=2))
+        second = list(run_fleet(self.vehicles, seed=7, workers=3))
+        self.assertEqual(first, second)
+
+    def test_extended_variant(self):
+        results = list(run_fleet([{'days': 14, 'sat_nc': 1, 'sat_dept': 10.0, 'sat_arr': 12.0, 'sat_dist': 15}], variant='extended', seed=3))
+        saturday_trips = results[0][1][5][1]
+        self.assertEqual(saturday_trips[-1][1], "10:00")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+# this test file tests the memory-mapped fleet store
+import unittest
+import os
+import tempfile
+import numpy as np
+import ev_simulation
+from analytics import TraceSummary, summarize_file
+from fleet import FLEET_STORE, iter_fleet_trips, vehicle_args, write_fleet
+from fleet_store import FleetStore, write_store
+from merge_trips import merge_columns, process_file
+from trace_io import as_columns, read_trace
+
+class TestFleetStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.vehicles = [ev_simulation.simulate_trips(vehicle_args('simple', {'days': days, 'seed': seed, 'no_cache': True}))
+                         for seed, days in enumerate([30, 60, 5])]
+        self.path = os.path.join(self.tmpdir.name, 'fleet.store')
+        # the second vehicle arrives in two chunks, as the simulators stream long horizons
+        write_store(self.path, [[self.vehicles[0]], np.array_split(self.vehicles[1], [37]), [self.vehicles[2]]])
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_vehicle_and_day_slices(self):
+        store = FleetStore(self.path)
+        self.assertEqual(len(store), 3)
+        for i, trips in enumerate(self.vehicles):
+            self.assertEqual(store.vehicle(i).tobytes(), trips.tobytes())
+            self.assertEqual(store.num_days(i), trips['day'].max())
+            for day in range(0, 62):
+                self.assertEqual(store.days(i, day).tobytes(), trips[trips['day'] == day].tobytes())
+            in_range = (trips['day'] >= 3) & (trips['day'] <= 9)
+            self.assertEqual(store.days(i, 3, 9).tobytes(), trips[in_range].tobytes())
+        # slices are views of the memory map
+        self.assertTrue(np.shares_memory(store.days(1, 10, 20), store.trips))
+
+    def test_merge_and_analytics_read_stores(self):
+        merged_path = os.path.join(self.tmpdir.name, 'merged.store')
+        process_file(self.path, merged_path)
+        merged = FleetStore(merged_path)
+        for i, trips in enumerate(self.vehicles):
+            expected = merge_columns(as_columns(trips))
+            for name, values in as_columns(merged.vehicle(i)).items():
+                np.testing.assert_array_equal(values, expected[name])
+        expected = TraceSummary()
+        for trips in self.vehicles:
+            expected.add_columns(as_columns(trips))
+        summary = summarize_file(self.path).report()
+        self.assertEqual(summary['files'], 3)
+        self.assertEqual(summary['days'], 95)
+        self.assertEqual(summary['trips'], expected.trips)
+        self.assertAlmostEqual(summary['total_distance_km'], expected.distance, places=3)
+
+    def test_simulator_and_fleet_writers(self):
+        output = os.path.join(self.tmpdir.name, 'single.store')
+        args = vehicle_args('simple', {'days': 30, 'seed': 0, 'no_cache': True, 'format': 'store', 'output': output})
+        ev_simulation.main(args)
+        np.testing.assert_array_equal(read_trace(output)['dep_min'], self.vehicles[0]['dep_min'])
+        with self.assertRaises(ValueError):
+            read_trace(self.path)
+        write_fleet(iter_fleet_trips([{'days': 7}, {'days': 14}], seed=1, workers=1), self.tmpdir.name, 'store')
+        store = FleetStore(os.path.join(self.tmpdir.name, FLEET_STORE))
+        self.assertEqual([store.num_days(i) for i in range(len(store))], [7, 14])
+
+
+if __name__ == '__main__':
+    unittest.main()
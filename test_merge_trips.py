@@ -0,0 +1,66 @@
+# this test file tests the merging of overlapping trips
+import unittest
+import os
+import tempfile
+import numpy as np
+import shutil
+from merge_trips import merge_columns, process_batch, process_file
+from trace_io import read_trace
+
+class TestMergeTrips(unittest.TestCase):
+    def setUp(self):
+        self.columns = read_trace('ev_data_T1.csv')
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_vectorized_merge_removes_overlaps(self):
+        merged = merge_columns(self.columns)
+        has_trip = merged['dep_min'] >= 0
+        same_day = merged['day'][1:] == merged['day'][:-1]
+        both_trips = has_trip[1:] & has_trip[:-1]
+        self.assertTrue((merged['dep_min'][1:][same_day & both_trips] > merged['arr_min'][:-1][same_day & both_trips]).all())
+        self.assertEqual(sorted(set(merged['day'].tolist())), sorted(set(self.columns['day'].tolist())))
+
+    def test_vectorized_merge_keeps_totals(self):
+        merged = merge_columns(self.columns)
+        self.assertAlmostEqual(float(np.nansum(merged['distance'])), float(np.nansum(self.columns['distance'])), places=1)
+        self.assertAlmostEqual(float(np.nansum(merged['travel_time'])), float(np.nansum(self.columns['travel_time'])), places=1)
+
+    def test_vectorized_matches_row_merge_on_unordered_trips(self):
+        # day 7 of T3 lists the 16:51 trip before the 14:29 one, both paths order a day by departure
+        for name in ['rows', 'vectorized']:
+            process_file('ev_data_T3.csv', os.path.join(self.tmpdir.name, f"{name}.csv"), vectorized=name == 'vectorized')
+        by_rows = read_trace(os.path.join(self.tmpdir.name, 'rows.csv'))
+        vectorized = read_trace(os.path.join(self.tmpdir.name, 'vectorized.csv'))
+        for name, values in vectorized.items():
+            np.testing.assert_array_equal(by_rows[name], values, name)
+        self.assertEqual(by_rows['dep_min'][by_rows['day'] == 7].tolist(), [14 * 60 + 29, 16 * 60 + 51])
+
+    def test_batch_skips_up_to_date_outputs(self):
+        input_dir = os.path.join(self.tmpdir.name, 'traces')
+        output_dir = os.path.join(self.tmpdir.name, 'merged')
+        os.makedirs(input_dir)
+        for name in ['ev_data_T1.csv', 'ev_data_T2.csv', 'ev_data_T3.csv']:
+            shutil.copy(name, input_dir)
+        for skip in ['mtime', 'hash']:
+            first = list(process_batch(input_dir, output_dir, workers=2, skip=skip))
+            second = list(process_batch(input_dir, output_dir, workers=2, skip=skip))
+            self.assertEqual(len(first), 3)
+            self.assertTrue(all(report['skipped'] for report in second))
+        process_file(os.path.join(input_dir, 'ev_data_T2.csv'), os.path.join(self.tmpdir.name, 'single.csv'))
+        with open(os.path.join(self.tmpdir.name, 'single.csv')) as single, open(os.path.join(output_dir, 'ev_data_T2.csv')) as batch:
+            self.assertEqual(single.read(), batch.read())
+
+        # switching the merge mode merges again, an interrupted batch keeps the files it merged
+        for skip in ['mtime', 'hash']:
+            self.assertFalse(any(report['skipped'] for report in process_batch(input_dir, output_dir, workers=2, vectorized=True, skip=skip)))
+            reports = process_batch(input_dir, output_dir, workers=1, skip=skip)
+            next(reports)
+            reports.close()
+            self.assertEqual([report['skipped'] for report in process_batch(input_dir, output_dir, workers=1, skip=skip)], [True, False, False])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+# this test file tests the stage profiling
+import unittest
+import json
+import os
+import tempfile
+import ev_simulation
+from fleet import vehicle_args
+from merge_trips import process_file
+from profiling import PROFILER, profiled
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmpdir.name, name)
+
+    def test_simulator_summary(self):
+        args = vehicle_args('simple', {'days': 100, 'profile': self.path('profile.json'), 'cprofile': self.path('run.pstats')})
+        args.output = self.path('trace.csv')
+        ev_simulation.main(args)
+        with open(self.path('profile.json')) as file:
+            summary = json.load(file)
+        self.assertEqual(summary['counts']['days'], 100)
+        self.assertTrue({'sample', 'soc', 'records', 'format', 'write'} <= set(summary['stages']))
+        self.assertLessEqual(sum(summary['stages'].values()), summary['total_seconds'] * 1.01)
+        self.assertTrue(os.path.exists(self.path('run.pstats')))
+        self.assertFalse(PROFILER.enabled)
+
+    def test_merge_summary_and_disabled(self):
+        with profiled('merge_trips', self.path('merge.json')):
+            process_file('ev_data_T1.csv', self.path('merged.csv'))
+        with open(self.path('merge.json')) as file:
+            summary = json.load(file)
+        self.assertEqual(summary['counts']['rows_in'], 442)
+        PROFILER.reset()
+        process_file('ev_data_T1.csv', self.path('merged.csv'))
+        self.assertEqual(PROFILER.seconds, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+# this test file tests the scenario files
+import unittest
+import json
+import os
+import tempfile
+from fleet import run_fleet, vehicle_args
+from scenario import load_scenario
+
+class TestScenario(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, mode='w') as file:
+            file.write(text)
+        return path
+
+    def test_presets_match_cli(self):
+        variant, seed, vehicles = load_scenario({'defaults': {'days': 30}, 'vehicles': [{'preset': 'T1'}, {'preset': 'T2', 'C_dist': 40, 'count': 2}]})
+        self.assertEqual((variant, seed, len(vehicles)), ('simple', None, 3))
+        cli = vehicle_args('simple', {'days': 30, 'ev_battery': 60, 'C_dist': 62.8, 'C_dept': 8.0, 'C_arr': 18.0})
+        self.assertEqual(vars(vehicles[0]), vars(cli))
+        self.assertEqual(vehicles[2].C_dist, 40.0)
+        self.assertEqual(vehicles[2].wfh_wednesday, 1)
+
+    def test_toml_and_yaml_single_vehicle_extended(self):
+        toml = self.write('car.toml', 'variant = "extended"\nseed = 3\ndays = 14\nweekdays = {sat = {nc = 1, dept = 10.0, arr = 12.0, dist = 15}}\n')
+        yaml = self.write('car.yaml', 'variant: extended\nseed: 3\ndays: 14\nweekdays:\n  sat: {nc: 1, dept: 10.0, arr: 12.0, dist: 15}\n')
+        loaded = [load_scenario(path) for path in (toml, yaml)]
+        self.assertEqual([vars(vehicle) for vehicle in loaded[0][2]], [vars(vehicle) for vehicle in loaded[1][2]])
+        variant, seed, vehicles = loaded[0]
+        self.assertEqual(vehicles[0].sat_dist, 15.0)
+        results = list(run_fleet(vehicles, variant, seed))
+        self.assertEqual(results[0][1][5][1][-1][1], "10:00")
+
+    def test_bulk_validation(self):
+        vehicles = [{'preset': 'T1'}] * 5 + [{'preset': 'T1', 'max_soc': 0.1}]
+        with self.assertRaisesRegex(ValueError, r"Max SOC must be greater than Min SOC \(vehicle 5\)"):
+            load_scenario({'vehicles': vehicles})
+        with self.assertRaisesRegex(ValueError, "Unknown simulator arguments"):
+            load_scenario({'days': 10, 'battery': 40})
+        with self.assertRaisesRegex(ValueError, "days must be an integer"):
+            load_scenario({'days': 10.5})
+        with self.assertRaisesRegex(ValueError, "requires"):
+            load_scenario({'variant': 'extended', 'weekdays': {'mon': {'nc': 2}}})
+
+    def test_large_scenario(self):
+        path = self.write('fleet.json', json.dumps({'vehicles': [{'preset': 'T1', 'C_dist': 10 + i % 50} for i in range(20000)]}))
+        _, _, vehicles = load_scenario(path)
+        self.assertEqual(len(vehicles), 20000)
+        self.assertEqual(vehicles[-1].C_dist, 59.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+# this test file tests the server mode and the lazy imports
+import unittest
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from server import handle_request, serve_lines
+
+class TestServer(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_requests(self):
+        first = os.path.join(self.tmpdir.name, 'first.csv')
+        second = os.path.join(self.tmpdir.name, 'second.csv')
+        lines = [
+            json.dumps({'variant': 'simple', 'args': {'days': 7, 'seed': 1, 'no_cache': True, 'output': first}}),
+            '',
+            json.dumps({'variant': 'extended', 'argv': ['--days', '7', '--output', second, '--sat_nc', '1', '--sat_dept', '10', '--sat_arr', '12', '--sat_dist', '15']}),
+            json.dumps({'variant': 'simple', 'args': {'days': 7, 'max_soc': 1.5}}),
+            'not json'
+        ]
+        responses = []
+        serve_lines(lines, responses.append)
+        responses = [json.loads(response) for response in responses]
+        self.assertEqual([response['ok'] for response in responses], [True, True, False, False])
+        self.assertEqual(responses[0]['output'], first)
+        self.assertEqual(responses[2]['error'], "SOC values must be between 0 and 1")
+        with open(second) as file:
+            self.assertIn("Saturday,10:00", file.read())
+
+    def test_invalid_command_line(self):
+        response = handle_request(json.dumps({'variant': 'simple', 'argv': ['--days', 'many']}))
+        self.assertFalse(response['ok'])
+
+    def test_invalid_args_do_not_stop_server(self):
+        output = os.path.join(self.tmpdir.name, 'ev_data.csv')
+        lines = [json.dumps({'args': {'days': 'abc'}}), json.dumps({'args': {'dayz': 3}}), json.dumps({'args': 5}), json.dumps([1]),
+                 json.dumps({'args': {'days': 3, 'seed': 1, 'no_cache': True, 'output': output}})]
+        result = subprocess.run([sys.executable, 'server.py'], input='\n'.join(lines) + '\n', capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(result.returncode, 0)
+        responses = [json.loads(line) for line in result.stdout.splitlines()]
+        self.assertEqual([response['ok'] for response in responses], [False, False, False, False, True])
+        self.assertEqual(responses[2]['error'], "The args of a request must be a JSON object")
+
+    def test_text_tools_do_not_import_numpy(self):
+        for module in ['analytics', 'merge_trips']:
+            result = subprocess.run([sys.executable, '-c', f"import sys, {module}; print('numpy' in sys.modules)"], capture_output=True, text=True,
+                                    cwd=os.path.dirname(os.path.abspath(__file__)))
+            self.assertEqual(result.stdout.strip(), 'False', module)
+
+
+if __name__ == '__main__':
+    unittest.main()
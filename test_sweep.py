@@ -0,0 +1,54 @@
+# this test file tests the parameter sweeps
+import unittest
+import os
+import tempfile
+import numpy as np
+from sweep import run_sweep, sweep_points
+
+class TestSweep(unittest.TestCase):
+    def setUp(self):
+        self.spec = {
+            'variant': 'simple',
+            'base': {'days': 28},
+            'grid': {'ev_battery': [40, 60], 'wfh_monday': [0, 1]},
+            'random': {'C_dist': [10.0, 80.0], 'N_nc': [0, 10]},
+            'samples': 2,
+            'seed': 1
+        }
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.tmpdir.name, 'sweep.npz')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_points(self):
+        points = sweep_points(self.spec)
+        self.assertEqual(len(points), 8)
+        self.assertTrue(all(point['days'] == 28 and 10 <= point['C_dist'] <= 80 for point in points))
+        self.assertTrue(all(isinstance(point['N_nc'], int) for point in points))
+
+    def test_consolidated_output(self):
+        progress = list(run_sweep(self.spec, self.output, workers=2))
+        self.assertEqual(progress[-1], (8, 8))
+        with np.load(self.output) as result:
+            self.assertEqual(len(result['summary_min_soc']), 8)
+            self.assertEqual(result['param_ev_battery'].tolist(), [40, 40, 60, 60] * 2)
+            self.assertEqual(set(result['point'].tolist()), set(range(8)))
+            self.assertTrue((result['summary_min_soc'] >= 0.2 * result['param_ev_battery']).all())
+
+    def test_resume_skips_finished_points(self):
+        list(run_sweep(self.spec, self.output, workers=2))
+        with np.load(self.output) as result:
+            first = result['summary_distance_km'].copy()
+        os.remove(os.path.join(self.output + '.parts', 'point_3.npz'))
+        progress = list(run_sweep(self.spec, self.output, workers=2))
+        self.assertEqual(progress, [(8, 8)])
+        with np.load(self.output) as result:
+            self.assertEqual(result['summary_distance_km'].tolist(), first.tolist())
+        self.spec['samples'] = 3
+        with self.assertRaises(ValueError):
+            list(run_sweep(self.spec, self.output))
+
+
+if __name__ == '__main__':
+    unittest.main()
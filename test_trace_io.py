@@ -0,0 +1,51 @@
+# this test file tests the columnar trace storage
+import unittest
+import argparse
+import os
+import tempfile
+from ev_simulation import ElectricVehicle, generate_trip_data, write_to_csv
+from merge_trips import process_file
+from trace_io import read_trace, write_trace
+
+class TestTraceIO(unittest.TestCase):
+    def setUp(self):
+        args = argparse.Namespace(days=60, ev_battery=40, max_soc=0.8, min_soc=0.2, consumption=164, wfh_monday=0, wfh_tuesday=1,
+                                  wfh_wednesday=0, wfh_thursday=1, wfh_friday=0, C_dist=20.0, C_dept=7.45, C_arr=17.30, N_nc=5, N_hw=2)
+        ev = ElectricVehicle(args.ev_battery, args.max_soc, args.min_soc, args.consumption)
+        self.trip_data = generate_trip_data(args, ev)
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmpdir.name, name)
+
+    def test_npz_matches_csv(self):
+        write_to_csv(self.path('trace.csv'), self.trip_data)
+        write_trace(self.path('trace.npz'), self.trip_data, 'npz')
+        from_csv = read_trace(self.path('trace.csv'))
+        from_npz = read_trace(self.path('trace.npz'))
+        for name, values in from_csv.items():
+            self.assertEqual(values.dtype, from_npz[name].dtype)
+            self.assertTrue(((values == from_npz[name]) | (values != values)).all(), name)
+
+    def test_no_trip_days_are_marked(self):
+        write_trace(self.path('trace.npz'), self.trip_data, 'npz')
+        columns = read_trace(self.path('trace.npz'))
+        no_trip_days = sum(1 for _, trips in self.trip_data if trips[0][1] == "No trips")
+        self.assertEqual(int((columns['dep_min'] < 0).sum()), no_trip_days)
+
+    def test_merge_accepts_columnar_input(self):
+        write_to_csv(self.path('trace.csv'), self.trip_data)
+        write_trace(self.path('trace.npz'), self.trip_data, 'npz')
+        process_file(self.path('trace.csv'), self.path('merged.csv'))
+        process_file(self.path('trace.npz'), self.path('merged.npz'))
+        merged_csv = read_trace(self.path('merged.csv'))
+        merged_npz = read_trace(self.path('merged.npz'))
+        self.assertEqual(merged_csv['day'].tolist(), merged_npz['day'].tolist())
+        self.assertEqual(merged_csv['arr_min'].tolist(), merged_npz['arr_min'].tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,234 @@
+# Columnar storage of EV traces. The CSV output is convenient to read, but for fleet-sized runs the
+# text round trip costs disk space and parse time, so traces can also be stored as typed arrays:
+# NumPy .npz files, Parquet files when pyarrow is installed, or fleet stores (see fleet_store.py). NumPy is
+# only imported once a trace is converted to arrays, so text-only users such as distance.py start quickly.
+import csv
+import functools
+import os
+from profiling import PROFILER
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+HEADER = ["Day", "Weekday", "Departure Time", "SOC on Departure", "Arrival Time", "SOC on Arrival", "Distance (km)", "Travel Time (min)"]
+# departure/arrival are minutes since midnight, -1 marks a day without trips
+COLUMNS = {
+    'day': 'int32',
+    'weekday': 'int8',
+    'dep_min': 'int16',
+    'arr_min': 'int16',
+    'soc_dep': 'float32',
+    'soc_arr': 'float32',
+    'distance': 'float32',
+    'travel_time': 'float32'
+}
+FORMATS = ['csv', 'npz', 'parquet', 'store']
+# file marking a directory as a complete fleet store
+STORE_META = 'meta.json'
+
+@functools.lru_cache(maxsize=None)
+def trip_dtype():
+    """One trip per record, the compact in-memory form of a trace. floor_hit marks trips that ran into
+    min SOC when the SOC is carried across days and is not written to trace files. Built on the first call,
+    which imports NumPy."""
+    import numpy as np
+    return np.dtype(list(COLUMNS.items()) + [('floor_hit', np.bool_)])
+
+def time_to_minutes(time_str):
+    """Converts a time string in HH:MM format to minutes since midnight, -1 if there is no time"""
+    try:
+        hours, minutes = map(int, time_str.split(':'))
+        return hours * 60 + minutes
+    except ValueError:
+        return -1
+
+def to_float(value):
+    """Converts a CSV field to float, NaN if the field is empty"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
+def rows_to_columns(rows, dtypes=COLUMNS):
+    """Converts CSV rows (Day, Weekday, Departure Time, ...) to typed column arrays"""
+    values = {name: [] for name in COLUMNS}
+    for row in rows:
+        if len(row) < 6:
+            continue
+        values['day'].append(int(row[0]))
+        values['weekday'].append(WEEKDAYS.index(row[1]))
+        values['dep_min'].append(time_to_minutes(row[2]))
+        values['arr_min'].append(time_to_minutes(row[4]))
+        values['soc_dep'].append(to_float(row[3]))
+        values['soc_arr'].append(to_float(row[5]))
+        values['distance'].append(to_float(row[6]) if len(row) > 6 else float('nan'))
+        values['travel_time'].append(to_float(row[7]) if len(row) > 7 else float('nan'))
+    import numpy as np
+    return {name: np.array(values[name], dtype=dtype) for name, dtype in dtypes.items()}
+
+def trip_data_to_columns(trip_data):
+    """Converts the simulators' [(day, [trip, ...]), ...] output to typed column arrays"""
+    return rows_to_columns([day, *trip] for day, trips in trip_data for trip in trips)
+
+def as_columns(trips):
+    """Column arrays (views) of a trip_dtype() record array"""
+    return {name: trips[name] for name in COLUMNS}
+
+def as_records(columns):
+    """Packs column arrays into a trip_dtype() record array"""
+    import numpy as np
+    trips = np.empty(len(columns['day']), dtype=trip_dtype())
+    for name in COLUMNS:
+        trips[name] = columns[name]
+    trips['floor_hit'] = columns.get('floor_hit', False)
+    return trips
+
+def columns_to_rows(columns):
+    """Formats column arrays back to CSV rows with the simulators' output schema"""
+    fields = [columns[name].tolist() for name in COLUMNS]
+    for day, weekday, dep, arr, soc_dep, soc_arr, distance, travel_time in zip(*fields):
+        if dep < 0:
+            yield [day, WEEKDAYS[weekday], "No trips", f"{soc_dep:.2f}", "", f"{soc_arr:.2f}"]
+            continue
+        yield [day, WEEKDAYS[weekday], f"{dep // 60:02d}:{dep % 60:02d}", f"{soc_dep:.2f}", f"{arr // 60:02d}:{arr % 60:02d}", f"{soc_arr:.2f}",
+               "" if distance != distance else f"{distance:.2f}", "" if travel_time != travel_time else f"{travel_time:.0f}"]
+
+def is_store(path):
+    return os.path.isfile(os.path.join(path, STORE_META))
+
+def trace_format(file_name):
+    """Infers the trace format from the file extension"""
+    if file_name.endswith('.npz'):
+        return 'npz'
+    if file_name.endswith('.parquet'):
+        return 'parquet'
+    if file_name.endswith('.store') or is_store(file_name):
+        return 'store'
+    return 'csv'
+
+def write_columns(file_name, columns, fmt=None):
+    fmt = fmt or trace_format(file_name)
+    if fmt == 'npz':
+        import numpy as np
+        np.savez(file_name, **columns)
+    elif fmt == 'parquet':
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("Writing Parquet files requires pyarrow to be installed")
+        pq.write_table(pa.table(columns), file_name)
+    elif fmt == 'store':
+        from fleet_store import write_store
+        write_store(file_name, [[as_records(columns)]])
+    else:
+        with open(file_name, mode='w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(HEADER)
+            writer.writerows(columns_to_rows(columns))
+
+def write_trace(file_name, trip_data, fmt=None):
+    """Writes simulator output in the given format (csv, npz or parquet)"""
+    write_columns(file_name, trip_data_to_columns(trip_data), fmt)
+
+def write_trips(file_name, chunks, fmt=None, append=False):
+    """Writes trip_dtype() record arrays, CSV and stores chunk by chunk, the other columnar formats as one table.
+    With append the trips follow those already in the file, npz and parquet files are rewritten for that."""
+    fmt = fmt or trace_format(file_name)
+    if fmt == 'store':
+        from fleet_store import StoreWriter
+        with StoreWriter(file_name, append) as writer:
+            if append:
+                writer.extend_vehicle(chunks)
+            else:
+                writer.add_vehicle(chunks)
+        return
+    if fmt != 'csv':
+        import numpy as np
+        trips = np.concatenate(([as_records(read_trace(file_name))] if append else []) + list(chunks))
+        with PROFILER.stage('write'):
+            if append:
+                replace_columns(file_name, as_columns(trips), fmt)
+            else:
+                write_columns(file_name, as_columns(trips), fmt)
+        PROFILER.count('rows_written', len(trips))
+        return
+    with open(file_name, mode='a' if append else 'w', newline='') as file:
+        writer = csv.writer(file)
+        if not append:
+            writer.writerow(HEADER)
+        for trips in chunks:
+            with PROFILER.stage('format'):
+                rows = list(columns_to_rows(as_columns(trips)))
+            with PROFILER.stage('write'):
+                writer.writerows(rows)
+            PROFILER.count('rows_written', len(rows))
+
+def replace_columns(file_name, columns, fmt):
+    """Rewrites a columnar trace through a temporary file, an interrupted rewrite keeps the old trace"""
+    root, extension = os.path.splitext(file_name)
+    tmp_name = f"{root}.tmp{extension}"
+    write_columns(tmp_name, columns, fmt)
+    os.replace(tmp_name, file_name)
+
+def trace_size(file_name, fmt=None):
+    """Size in bytes of a CSV trace, which an interrupted append is cut back to, None for the other formats"""
+    fmt = fmt or trace_format(file_name)
+    return os.path.getsize(file_name) if fmt == 'csv' and os.path.exists(file_name) else None
+
+def last_csv_day(file_name):
+    """Day of the last row of a CSV trace, read from the end of the file, 0 without rows"""
+    with open(file_name, mode='rb') as file:
+        file.seek(max(os.path.getsize(file_name) - 4096, 0))
+        lines = file.read().splitlines()
+    for line in reversed(lines):
+        day = line.split(b',', 1)[0]
+        if day.isdigit():
+            return int(day)
+    return 0
+
+def truncate_trace(file_name, last_day, size=None, fmt=None):
+    """Cuts a trace back to the days up to last_day, e.g. after an interrupted append, CSV files to size bytes.
+    Raises ValueError if the trace does not end on last_day then, last_day None only cuts to size."""
+    fmt = fmt or trace_format(file_name)
+    if fmt == 'store':
+        from fleet_store import StoreWriter
+        with StoreWriter(file_name, append=True) as writer:
+            writer.truncate_vehicle(last_day)
+        end_day = writer.last_day()
+    elif fmt == 'csv':
+        if size is not None and os.path.getsize(file_name) > size:
+            os.truncate(file_name, size)
+        end_day = last_csv_day(file_name) if last_day is not None else None
+    else:
+        columns = read_trace(file_name)
+        keep = columns['day'] <= last_day
+        if not keep.all():
+            replace_columns(file_name, {name: values[keep] for name, values in columns.items()}, fmt)
+        end_day = int(columns['day'][keep][-1]) if keep.any() else 0
+    if end_day != last_day:
+        raise ValueError(f"{file_name} ends on day {end_day}, but its continuation state on day {last_day}")
+
+def read_trace(file_name):
+    """Reads a trace file (CSV, merged CSV, npz, parquet or a single-vehicle store) into typed column arrays"""
+    fmt = trace_format(file_name)
+    if fmt == 'store':
+        from fleet_store import FleetStore
+        store = FleetStore(file_name)
+        if len(store) != 1:
+            raise ValueError(f"{file_name} holds {len(store)} vehicles, read it with fleet_store.FleetStore")
+        return store.columns(0)
+    if fmt == 'npz':
+        import numpy as np
+        # np.savez appends .npz to names without it, so the name always carries the extension
+        with np.load(file_name) as data:
+            return {name: data[name].astype(dtype, copy=False) for name, dtype in COLUMNS.items()}
+    if fmt == 'parquet':
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("Reading Parquet files requires pyarrow to be installed")
+        table = pq.read_table(file_name)
+        return {name: table.column(name).to_numpy().astype(dtype, copy=False) for name, dtype in COLUMNS.items()}
+    with open(file_name, mode='r', newline='') as file:
+        reader = csv.reader(file)
+        next(reader)
+        return rows_to_columns(reader)